@@ -2,14 +2,33 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
+from instrumentation import span, get_stage_summary, get_symbol_counters, reset as reset_diagnostics
+from refresher import get_shared_snapshot
+from monte_carlo import simulate_risk_of_ruin, DEFAULT_PATHS, DEFAULT_TRADES, RUIN_DRAWDOWN, MAX_SIMULATED_TRADES
+from backtest import backtest_symbol, MAX_HOLD_DAYS
+from portfolio import Portfolio
 from futures_data import (
-    get_all_futures_with_market_data, 
+    get_section_futures_with_market_data_df,
+    get_market_snapshot,
+    prefetch_market_data,
+    related_symbols,
+    format_futures_table,
     get_future_by_symbol, 
     get_stop_loss_levels, 
     calculate_r_multiples,
     get_current_price,
     calculate_atr,
-    FUTURES_DATA
+    calculate_stop_target_grid,
+    calculate_risk_amount,
+    calculate_position_sizes,
+    FUTURES_DATA,
+    CONTRACTS,
+    CONTRACTS_BY_SECTION,
+    BREAKERS,
+    ATR_MULTIPLIERS,
+    R_MULTIPLES,
+    LONG,
+    SHORT
 )
 
 # Set page configuration
@@ -91,102 +110,93 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Reruns with unchanged simulation inputs, e.g. after editing the backtest settings, reuse the result
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_risk_of_ruin(account_size, risk_per_trade, win_rate, payoff_r, trades, paths):
+    # A fixed seed keeps the results steady across reruns with the same inputs
+    return simulate_risk_of_ruin(account_size, risk_per_trade, win_rate, payoff_r, trades, paths, seed=0)
+
 # Sidebar
 st.sidebar.title("Futures Calculator")
 # Use a more reliable emoji instead of an external image
 st.sidebar.markdown("### 📊 Futures Trading Tools")
 
 # Navigation
-page = st.sidebar.radio("Navigation", ["Futures Table", "Position Size Calculator"])
+page = st.sidebar.radio("Navigation", ["Futures Table", "Position Size Calculator", "Portfolio"])
+
+# Market data normally comes from the snapshot published by the background refresher;
+# until the first one exists, pages fetch what they need themselves
+shared_snapshot = get_shared_snapshot()
 
 # Futures Table Page
 if page == "Futures Table":
     st.title("Futures Market Instruments")
     st.markdown("### Comprehensive Futures Contract Information")
     
-    # Get futures data with market information
-    with st.spinner("Loading market data..."):
-        futures_data = get_all_futures_with_market_data()
-    
-    # Convert to DataFrame for display
-    df = pd.DataFrame(futures_data)
-    
-    # Format the DataFrame for display
-    display_df = df.copy()
-    display_df['tick_value'] = display_df['tick_size'] * display_df['multiplier']
+    column_config = {
+        'Tick Size': st.column_config.NumberColumn(format="%g"),
+        'Multiplier': st.column_config.NumberColumn(format="%g"),
+        'Tick Value': st.column_config.NumberColumn(format="$%.2f"),
+        'Current Price': st.column_config.NumberColumn(format="$%.2f"),
+        'Notional Exposure': st.column_config.NumberColumn(format="$%.2f"),
+        'SPAN Margin (Approx)': st.column_config.NumberColumn(format="$%.2f"),
+        'Avg Daily P/L Range': st.column_config.NumberColumn(
+            format="$%.2f", help="14-day ATR multiplied by the contract multiplier"
+        ),
+        'ATR (pts)': st.column_config.NumberColumn(format="%.2f", help="14-day ATR in price points")
+    }
     
-    # Format numeric columns
-    numeric_cols = ['current_price', 'notional_exposure', 'tick_value', 'initial_margin']
-    for col in numeric_cols:
-        if col in display_df.columns:
-            display_df[col] = display_df[col].apply(
-                lambda x: f"${x:.2f}" if isinstance(x, (int, float)) else x
-            )
-            
-    # Store original ATR values for points reference
-    if 'atr' in display_df.columns:
-        display_df['atr_points'] = display_df['atr']
-        
-        # Format ATR for display
-        display_df['atr'] = display_df['atr'].apply(
-            lambda x: f"${x:.2f}" if isinstance(x, (int, float)) else x
-        )
+    # Select columns to display
+    columns_to_display = [
+        'name', 'ticker', 'symbol', 'notional_value', 'tick_size', 
+        'multiplier', 'tick_value', 'current_price', 'notional_exposure', 
+        'initial_margin', 'etf_equivalent', 'etf_shares_approx', 'daily_pnl_range',
+        'atr_points'
+    ]
     
-    # Format daily_pnl_range to show both dollar value and points
-    if 'daily_pnl_range' in display_df.columns and 'atr_points' in display_df.columns:
-        display_df['daily_pnl_range'] = display_df.apply(
-            lambda row: f"${row['daily_pnl_range']:.2f} ({row['atr_points']:.2f} pts)" 
-            if isinstance(row['daily_pnl_range'], (int, float)) and isinstance(row['atr_points'], (int, float))
-            else row['daily_pnl_range'],
-            axis=1
-        )
+    # Rename columns for better display
+    renamed_columns = {
+        'name': 'Name',
+        'ticker': 'Ticker',
+        'symbol': 'Symbol',
+        'notional_value': 'Notional Value',
+        'tick_size': 'Tick Size',
+        'multiplier': 'Multiplier',
+        'tick_value': 'Tick Value',
+        'current_price': 'Current Price',
+        'notional_exposure': 'Notional Exposure',
+        'initial_margin': 'SPAN Margin (Approx)',
+        'etf_equivalent': 'ETF Equivalent',
+        'etf_shares_approx': 'ETF Shares Approx',
+        'daily_pnl_range': 'Avg Daily P/L Range',
+        'atr_points': 'ATR (pts)'
+    }
     
-    # Group by section for display
-    sections = display_df['section'].unique().tolist()
+    # Sections come from the contract registry, so the tabs draw before any data is fetched
+    sections = list(CONTRACTS_BY_SECTION)
     
-    # Create tabs for each section
-    tabs = st.tabs(sections)
+    # Stateful tabs rerun on a switch and only the open tab loads its section's market data
+    tabs = st.tabs(sections, key="futures_table_section", on_change="rerun")
     
-    for i, section in enumerate(sections):
-        with tabs[i]:
-            section_df = display_df[display_df['section'] == section].copy()
-            
-            # Select columns to display
-            columns_to_display = [
-                'name', 'ticker', 'symbol', 'notional_value', 'tick_size', 
-                'multiplier', 'tick_value', 'current_price', 'notional_exposure', 
-                'initial_margin', 'etf_equivalent', 'etf_shares_approx', 'daily_pnl_range'
-            ]
+    for tab, section in zip(tabs, sections):
+        if not tab.open:
+            continue
+        
+        with tab, span('render', page=page, section=section):
+            with st.spinner(f"Loading {section} market data..."):
+                section_df = get_section_futures_with_market_data_df(section, shared_snapshot)
             
-            # Rename columns for better display
-            renamed_columns = {
-                'name': 'Name',
-                'ticker': 'Ticker',
-                'symbol': 'Symbol',
-                'notional_value': 'Notional Value',
-                'tick_size': 'Tick Size',
-                'multiplier': 'Multiplier',
-                'tick_value': 'Tick Value',
-                'current_price': 'Current Price',
-                'notional_exposure': 'Notional Exposure',
-                'initial_margin': 'SPAN Margin (Approx)',
-                'etf_equivalent': 'ETF Equivalent',
-                'etf_shares_approx': 'ETF Shares Approx',
-                'daily_pnl_range': 'Avg Daily P/L Range'
-            }
+            # Add the display columns; values stay numeric and are formatted by the column configs
+            display_section_df = format_futures_table(section_df)[columns_to_display].rename(columns=renamed_columns)
             
             # Display the section data
             st.markdown(f"### {section} Futures")
             
-            # Convert all columns to string to avoid PyArrow type errors
-            display_section_df = section_df[columns_to_display].rename(columns=renamed_columns).copy()
-            for col in display_section_df.columns:
-                display_section_df[col] = display_section_df[col].astype(str)
-                
             st.dataframe(
                 display_section_df,
-                use_container_width=True,
-                hide_index=True
+                width="stretch",
+                hide_index=True,
+                column_config=column_config
             )
 
 # Position Size Calculator Page
@@ -194,14 +204,13 @@ elif page == "Position Size Calculator":
     st.title("Futures Position Size Calculator")
     st.markdown("### Calculate position size, stop loss, and profit targets")
     
-    # Get all futures symbols for selection
-    all_futures = get_all_futures_with_market_data()
-    futures_dict = {f"{future['name']} ({future['ticker']})": future['symbol'] for future in all_futures}
+    # The selectbox only needs static contract details; market data is fetched for the selection alone
+    futures_dict = {f"{future['name']} ({future['ticker']})": future['symbol'] for future in CONTRACTS}
     
     # Create two columns for the layout
     col1, col2 = st.columns([1, 2])
     
-    with col1:
+    with col1, span('render', page=page, panel='inputs'):
         st.markdown("### Select Future")
         selected_future_name = st.selectbox(
             "Choose a futures contract:",
@@ -209,7 +218,16 @@ elif page == "Position Size Calculator":
         )
         
         selected_symbol = futures_dict[selected_future_name]
-        future = next((f for f in all_futures if f['symbol'] == selected_symbol), None)
+        future = get_future_by_symbol(selected_symbol)
+        
+        # Use market data for the selected contract from one snapshot for this run; everything below calculates from it
+        if shared_snapshot is not None and selected_symbol in shared_snapshot:
+            snapshot = shared_snapshot
+        else:
+            snapshot = get_market_snapshot([selected_symbol])
+            
+            # Warm the cache for the contracts likely to be picked next
+            prefetch_market_data(related_symbols(selected_symbol))
         
         if future:
             # Display contract specifications
@@ -225,11 +243,11 @@ elif page == "Position Size Calculator":
                     future['etf_equivalent']
                 ]
             }
-            st.dataframe(pd.DataFrame(specs_data), use_container_width=True, hide_index=True)
+            st.dataframe(pd.DataFrame(specs_data), width="stretch", hide_index=True)
             
             # Get current price and ATR
-            current_price = future.get('current_price')
-            atr_value = future.get('atr')
+            current_price = snapshot.price(selected_symbol)
+            atr_value = snapshot.atr(selected_symbol)
             
             if isinstance(current_price, (int, float)) and isinstance(atr_value, (int, float)):
                 st.markdown("### Market Data")
@@ -246,20 +264,24 @@ elif page == "Position Size Calculator":
                 
                 account_size = st.number_input("Account Size ($)", min_value=1000.0, value=100000.0, step=1000.0)
                 risk_percentage = st.slider("Risk Percentage (%)", min_value=0.1, max_value=5.0, value=1.0, step=0.1)
-                risk_amount = account_size * (risk_percentage / 100)
+                risk_amount = float(calculate_risk_amount(account_size, risk_percentage))
                 st.metric("Risk Amount ($)", f"${risk_amount:.2f}")
                 
                 # ATR multiplier for stop loss
                 atr_multiplier = st.select_slider(
                     "ATR Multiplier for Stop Loss",
-                    options=[0.25, 0.5, 0.75, 1.0, 1.25, 1.5],
+                    options=list(ATR_MULTIPLIERS),
                     value=1.0
                 )
                 
-                # Calculate stop distance and stop loss amount
-                stop_distance = atr_value * atr_multiplier
-                stop_price = current_price - stop_distance  # For long position
-                stop_loss_amount = stop_distance * future['multiplier']
+                # Calculate stops and targets for every ATR multiplier, R-multiple and direction at once
+                grid = calculate_stop_target_grid(
+                    [current_price], [atr_value], [future['multiplier']],
+                    ATR_MULTIPLIERS, R_MULTIPLES, (LONG, SHORT)
+                )
+                selected = ATR_MULTIPLIERS.index(atr_multiplier)
+                stop_price = grid['stop_price'][0, selected, 0, 0]  # For long position
+                stop_loss_amount = grid['stop_loss_amount'][0, selected, 0, 0]
                 
                 # Display stop loss information
                 st.markdown(f"""<div style='background-color: #f0f2f6; padding: 10px; border-radius: 5px; margin-top: 10px;'>
@@ -267,10 +289,7 @@ elif page == "Position Size Calculator":
                             </div>""", unsafe_allow_html=True)
                 
                 # Calculate position size - ensure it's at least 1 if valid
-                if stop_loss_amount > 0:
-                    max_contracts = max(1, int(risk_amount / stop_loss_amount))
-                else:
-                    max_contracts = 0
+                max_contracts = int(calculate_position_sizes(risk_amount, stop_loss_amount))
                 
                 # Display max contracts as a reference
                 st.metric("Maximum Contracts (Based on Risk)", max_contracts)
@@ -296,274 +315,140 @@ elif page == "Position Size Calculator":
             else:
                 st.error("Unable to fetch current price or ATR data for this contract.")
     
-    with col2:
+    with col2, span('render', page=page, panel='analysis'):
         if future and isinstance(current_price, (int, float)) and isinstance(atr_value, (int, float)):
             st.markdown("### Stop Loss & Target Analysis")
             
             # Create tabs for long and short positions
             position_tabs = st.tabs(["Long Position", "Short Position"])
             
-            with position_tabs[0]:  # Long Position
-                st.markdown("#### Stop Loss Levels")
-                
-                # Calculate stop loss levels for different ATR multipliers
-                atr_multipliers = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5]
-                stop_loss_cols = st.columns(len(atr_multipliers))
-                
-                for i, multiplier in enumerate(atr_multipliers):
-                    stop_distance = atr_value * multiplier
-                    stop_price = current_price - stop_distance
-                    stop_loss_amount = stop_distance * future['multiplier']
+            selected_stop_distance = grid['stop_distance'][0, selected, 0, 0]
+            selected_stop_loss_amount = grid['stop_loss_amount'][0, selected, 0, 0]
+            
+            for d, (tab, label, direction) in enumerate(zip(position_tabs, ["Long", "Short"], [LONG, SHORT])):
+                with tab:
+                    st.markdown("#### Stop Loss Levels")
                     
-                    with stop_loss_cols[i]:
-                        st.markdown(f"<div class='stop-loss-card'>"
-                                    f"<p><b>{multiplier} ATR</b></p>"
-                                    f"<p>Price: ${stop_price:.2f}</p>"
-                                    f"<p>Distance: {stop_distance:.2f} points (${stop_loss_amount:.2f})</p>"
-                                    f"</div>", unsafe_allow_html=True)
-                
-                # Calculate R-multiple targets based on the selected stop loss
-                st.markdown("#### Profit Targets (Based on selected ATR multiplier)")
-                
-                # Use the stop distance from the selected ATR multiplier
-                selected_stop_distance = atr_value * atr_multiplier
-                selected_stop_loss_amount = selected_stop_distance * future['multiplier']
-                
-                r_multiples = [1, 2, 2.5, 3]
-                target_cols = st.columns(len(r_multiples))
-                
-                for i, r in enumerate(r_multiples):
-                    target_distance = selected_stop_distance * r
-                    target_price = current_price + target_distance
-                    target_amount = selected_stop_loss_amount * r
+                    # Stop loss levels for different ATR multipliers
+                    stop_loss_cols = st.columns(len(ATR_MULTIPLIERS))
                     
-                    with target_cols[i]:
-                        st.markdown(f"<div class='target-card'>"
-                                    f"<p><b>{r}R Target</b></p>"
-                                    f"<p>Price: ${target_price:.2f}</p>"
-                                    f"<p>Distance: {target_distance:.2f} points (${target_amount:.2f})</p>"
-                                    f"</div>", unsafe_allow_html=True)
-                
-                # Risk-Reward visualization
-                st.markdown("#### Risk-Reward Visualization")
-                
-                # Create price range for visualization
-                price_range = np.linspace(
-                    stop_price - selected_stop_distance,
-                    current_price + (selected_stop_distance * 3.5),
-                    100
-                )
-                
-                # Create figure
-                fig = go.Figure()
-                
-                # Add price range area
-                fig.add_trace(go.Scatter(
-                    x=[0, 0],
-                    y=[price_range.min(), price_range.max()],
-                    mode='lines',
-                    line=dict(width=0),
-                    showlegend=False
-                ))
-                
-                # Add current price line
-                fig.add_shape(
-                    type="line",
-                    x0=0, x1=1,
-                    y0=current_price, y1=current_price,
-                    line=dict(color="blue", width=2, dash="solid"),
-                    xref="paper", yref="y"
-                )
-                
-                # Add stop loss line
-                fig.add_shape(
-                    type="line",
-                    x0=0, x1=1,
-                    y0=stop_price, y1=stop_price,
-                    line=dict(color="red", width=2, dash="dash"),
-                    xref="paper", yref="y"
-                )
-                
-                # Add target lines
-                for r, color in zip(r_multiples, ["green", "purple", "orange", "teal"]):
-                    target_price = current_price + (selected_stop_distance * r)
+                    for i, multiplier in enumerate(ATR_MULTIPLIERS):
+                        stop_price = grid['stop_price'][0, i, 0, d]
+                        stop_distance = grid['stop_distance'][0, i, 0, d]
+                        stop_loss_amount = grid['stop_loss_amount'][0, i, 0, d]
+                        
+                        with stop_loss_cols[i]:
+                            st.markdown(f"<div class='stop-loss-card'>"
+                                        f"<p><b>{multiplier} ATR</b></p>"
+                                        f"<p>Price: ${stop_price:.2f}</p>"
+                                        f"<p>Distance: {stop_distance:.2f} points (${stop_loss_amount:.2f})</p>"
+                                        f"</div>", unsafe_allow_html=True)
+                    
+                    # R-multiple targets based on the selected stop loss
+                    st.markdown("#### Profit Targets (Based on selected ATR multiplier)")
+                    
+                    target_cols = st.columns(len(R_MULTIPLES))
+                    
+                    for j, r in enumerate(R_MULTIPLES):
+                        target_price = grid['target_price'][0, selected, j, d]
+                        target_distance = grid['target_distance'][0, selected, j, d]
+                        target_amount = grid['target_amount'][0, selected, j, d]
+                        
+                        with target_cols[j]:
+                            st.markdown(f"<div class='target-card'>"
+                                        f"<p><b>{r}R Target</b></p>"
+                                        f"<p>Price: ${target_price:.2f}</p>"
+                                        f"<p>Distance: {target_distance:.2f} points (${target_amount:.2f})</p>"
+                                        f"</div>", unsafe_allow_html=True)
+                    
+                    # Risk-Reward visualization
+                    st.markdown("#### Risk-Reward Visualization")
+                    
+                    selected_stop_price = grid['stop_price'][0, selected, 0, d]
+                    target_prices = grid['target_price'][0, selected, :, d]
+                    
+                    # Show half a stop beyond the stop and half an R beyond the 3R target
+                    y_range = sorted([
+                        selected_stop_price - direction * selected_stop_distance * 0.5,
+                        current_price + direction * selected_stop_distance * 3.5
+                    ])
+                    
+                    # Create figure
+                    fig = go.Figure()
+                    
+                    # Add price range area
+                    fig.add_trace(go.Scatter(
+                        x=[0, 0],
+                        y=y_range,
+                        mode='lines',
+                        line=dict(width=0),
+                        showlegend=False
+                    ))
+                    
+                    # Add current price line
                     fig.add_shape(
                         type="line",
                         x0=0, x1=1,
-                        y0=target_price, y1=target_price,
-                        line=dict(color=color, width=2, dash="dot"),
+                        y0=current_price, y1=current_price,
+                        line=dict(color="blue", width=2, dash="solid"),
                         xref="paper", yref="y"
                     )
-                
-                # Add annotations
-                fig.add_annotation(
-                    x=1.02, y=current_price,
-                    text="Entry",
-                    showarrow=False,
-                    xref="paper", yref="y"
-                )
-                
-                fig.add_annotation(
-                    x=1.02, y=stop_price,
-                    text=f"Stop ({atr_multiplier} ATR)",
-                    showarrow=False,
-                    xref="paper", yref="y"
-                )
-                
-                for r in r_multiples:
-                    target_price = current_price + (selected_stop_distance * r)
-                    fig.add_annotation(
-                        x=1.02, y=target_price,
-                        text=f"{r}R",
-                        showarrow=False,
-                        xref="paper", yref="y"
-                    )
-                
-                # Update layout
-                fig.update_layout(
-                    title="Price Levels for Long Position",
-                    xaxis_title="",
-                    yaxis_title="Price",
-                    showlegend=False,
-                    height=400,
-                    margin=dict(l=0, r=100, t=30, b=0),
-                    xaxis=dict(showticklabels=False),
-                    yaxis=dict(range=[stop_price - (selected_stop_distance * 0.5), 
-                                      current_price + (selected_stop_distance * 3.5)])
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-                
-            with position_tabs[1]:  # Short Position
-                st.markdown("#### Stop Loss Levels")
-                
-                # Calculate stop loss levels for different ATR multipliers
-                atr_multipliers = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5]
-                stop_loss_cols = st.columns(len(atr_multipliers))
-                
-                for i, multiplier in enumerate(atr_multipliers):
-                    stop_distance = atr_value * multiplier
-                    stop_price = current_price + stop_distance  # For short position
-                    stop_loss_amount = stop_distance * future['multiplier']
-                    
-                    with stop_loss_cols[i]:
-                        st.markdown(f"<div class='stop-loss-card'>"
-                                    f"<p><b>{multiplier} ATR</b></p>"
-                                    f"<p>Price: ${stop_price:.2f}</p>"
-                                    f"<p>Distance: {stop_distance:.2f} points (${stop_loss_amount:.2f})</p>"
-                                    f"</div>", unsafe_allow_html=True)
-                
-                # Calculate R-multiple targets
-                st.markdown("#### Profit Targets (Based on selected ATR multiplier)")
-                
-                selected_stop_distance = atr_value * atr_multiplier
-                selected_stop_loss_amount = selected_stop_distance * future['multiplier']
-                
-                r_multiples = [1, 2, 2.5, 3]
-                target_cols = st.columns(len(r_multiples))
-                
-                for i, r in enumerate(r_multiples):
-                    target_distance = selected_stop_distance * r
-                    target_price = current_price - target_distance  # For short position
-                    target_amount = selected_stop_loss_amount * r
                     
-                    with target_cols[i]:
-                        st.markdown(f"<div class='target-card'>"
-                                    f"<p><b>{r}R Target</b></p>"
-                                    f"<p>Price: ${target_price:.2f}</p>"
-                                    f"<p>Distance: {target_distance:.2f} points (${target_amount:.2f})</p>"
-                                    f"</div>", unsafe_allow_html=True)
-                
-                # Risk-Reward visualization
-                st.markdown("#### Risk-Reward Visualization")
-                
-                # Create price range for visualization
-                price_range = np.linspace(
-                    current_price - (selected_stop_distance * 3.5),
-                    stop_price + selected_stop_distance,
-                    100
-                )
-                
-                # Create figure
-                fig = go.Figure()
-                
-                # Add price range area
-                fig.add_trace(go.Scatter(
-                    x=[0, 0],
-                    y=[price_range.min(), price_range.max()],
-                    mode='lines',
-                    line=dict(width=0),
-                    showlegend=False
-                ))
-                
-                # Add current price line
-                fig.add_shape(
-                    type="line",
-                    x0=0, x1=1,
-                    y0=current_price, y1=current_price,
-                    line=dict(color="blue", width=2, dash="solid"),
-                    xref="paper", yref="y"
-                )
-                
-                # Add stop loss line
-                stop_price_short = current_price + selected_stop_distance
-                fig.add_shape(
-                    type="line",
-                    x0=0, x1=1,
-                    y0=stop_price_short, y1=stop_price_short,
-                    line=dict(color="red", width=2, dash="dash"),
-                    xref="paper", yref="y"
-                )
-                
-                # Add target lines
-                for r, color in zip(r_multiples, ["green", "purple", "orange", "teal"]):
-                    target_price = current_price - (selected_stop_distance * r)
+                    # Add stop loss line
                     fig.add_shape(
                         type="line",
                         x0=0, x1=1,
-                        y0=target_price, y1=target_price,
-                        line=dict(color=color, width=2, dash="dot"),
+                        y0=selected_stop_price, y1=selected_stop_price,
+                        line=dict(color="red", width=2, dash="dash"),
                         xref="paper", yref="y"
                     )
-                
-                # Add annotations
-                fig.add_annotation(
-                    x=1.02, y=current_price,
-                    text="Entry",
-                    showarrow=False,
-                    xref="paper", yref="y"
-                )
-                
-                fig.add_annotation(
-                    x=1.02, y=stop_price_short,
-                    text=f"Stop ({atr_multiplier} ATR)",
-                    showarrow=False,
-                    xref="paper", yref="y"
-                )
-                
-                for r in r_multiples:
-                    target_price = current_price - (selected_stop_distance * r)
+                    
+                    # Add target lines
+                    for target_price, color in zip(target_prices, ["green", "purple", "orange", "teal"]):
+                        fig.add_shape(
+                            type="line",
+                            x0=0, x1=1,
+                            y0=target_price, y1=target_price,
+                            line=dict(color=color, width=2, dash="dot"),
+                            xref="paper", yref="y"
+                        )
+                    
+                    # Add annotations
                     fig.add_annotation(
-                        x=1.02, y=target_price,
-                        text=f"{r}R",
+                        x=1.02, y=current_price,
+                        text="Entry",
                         showarrow=False,
                         xref="paper", yref="y"
                     )
-                
-                # Update layout
-                fig.update_layout(
-                    title="Price Levels for Short Position",
-                    xaxis_title="",
-                    yaxis_title="Price",
-                    showlegend=False,
-                    height=400,
-                    margin=dict(l=0, r=100, t=30, b=0),
-                    xaxis=dict(showticklabels=False),
-                    yaxis=dict(range=[current_price - (selected_stop_distance * 3.5), 
-                                      stop_price_short + (selected_stop_distance * 0.5)])
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+                    
+                    fig.add_annotation(
+                        x=1.02, y=selected_stop_price,
+                        text=f"Stop ({atr_multiplier} ATR)",
+                        showarrow=False,
+                        xref="paper", yref="y"
+                    )
+                    
+                    for r, target_price in zip(R_MULTIPLES, target_prices):
+                        fig.add_annotation(
+                            x=1.02, y=target_price,
+                            text=f"{r}R",
+                            showarrow=False,
+                            xref="paper", yref="y"
+                        )
+                    
+                    # Update layout
+                    fig.update_layout(
+                        title=f"Price Levels for {label} Position",
+                        xaxis_title="",
+                        yaxis_title="Price",
+                        showlegend=False,
+                        height=400,
+                        margin=dict(l=0, r=100, t=30, b=0),
+                        xaxis=dict(showticklabels=False),
+                        yaxis=dict(range=y_range)
+                    )
+                    
+                    st.plotly_chart(fig, width="stretch")
                 
             # Position sizing summary
             st.markdown("### Position Sizing Summary")
@@ -597,10 +482,10 @@ elif page == "Position Size Calculator":
             st.markdown("### Potential Outcomes")
             
             outcomes_data = []
-            for r in [1, 2, 2.5, 3]:
+            for j, r in enumerate(R_MULTIPLES):
                 for pos in position_sizes:
                     contracts = pos["size"]
-                    profit = contracts * selected_stop_loss_amount * r
+                    profit = contracts * grid['target_amount'][0, selected, j, 0]
                     
                     outcomes_data.append({
                         "Position Size": f"{pos['label']} ({contracts} contract{'s' if contracts > 1 else ''})",
@@ -611,23 +496,241 @@ elif page == "Position Size Calculator":
             # Create DataFrame for display
             outcomes_df = pd.DataFrame(outcomes_data)
             
-            # Format profit/loss column
-            outcomes_df["Profit/Loss"] = outcomes_df["Profit/Loss"].apply(lambda x: f"${x:.2f}")
-            
-            # Convert all columns to strings to avoid PyArrow errors
-            for col in outcomes_df.columns:
-                outcomes_df[col] = outcomes_df[col].astype(str)
-            
             # Display the outcomes table
             st.dataframe(
                 outcomes_df,
-                use_container_width=True,
-                hide_index=True
+                width="stretch",
+                hide_index=True,
+                column_config={"Profit/Loss": st.column_config.NumberColumn(format="$%.2f")}
             )
             
+            # Simulate many trade sequences at the selected size and stop
+            st.markdown("### Risk of Ruin Simulation")
+            
+            sim_col1, sim_col2, sim_col3, sim_col4 = st.columns(4)
+            with sim_col1:
+                win_rate = st.slider("Win Rate (%)", min_value=10, max_value=90, value=50, step=1) / 100
+            with sim_col2:
+                payoff_r = st.select_slider("Payoff (R)", options=list(R_MULTIPLES), value=2)
+            with sim_col3:
+                trades = st.number_input("Trades per Sequence", min_value=10, max_value=1000, value=DEFAULT_TRADES, step=10)
+            with sim_col4:
+                paths = st.selectbox("Simulated Paths", options=[5000, DEFAULT_PATHS, 50000, 100000], index=1)
+            
+            # Keep long sequences interactive by simulating fewer of them
+            if paths * trades > MAX_SIMULATED_TRADES:
+                paths = int(MAX_SIMULATED_TRADES // trades)
+                st.caption(f"Simulating {paths:,} paths to keep {int(trades):,}-trade sequences responsive.")
+            
+            risk_per_trade = float(user_contracts * selected_stop_loss_amount)
+            with span('simulation', paths=paths, trades=trades):
+                simulation = cached_risk_of_ruin(
+                    float(account_size), risk_per_trade, win_rate, float(payoff_r), int(trades), paths
+                )
+            
+            metric_cols = st.columns(4)
+            metric_cols[0].metric(f"Risk of Ruin ({RUIN_DRAWDOWN:.0%} drawdown)", f"{simulation['risk_of_ruin']:.2%}")
+            metric_cols[1].metric("Expectancy per Trade", f"{simulation['expectancy_r']:.2f}R")
+            metric_cols[2].metric("Median Final Equity", f"${simulation['terminal_percentiles'][50]:,.0f}")
+            metric_cols[3].metric("Median Max Drawdown", f"{simulation['drawdown_percentiles'][50]:.1%}")
+            
+            # Sample equity curves with the ruin level
+            fig = go.Figure()
+            for path in simulation['sample_paths']:
+                fig.add_trace(go.Scatter(
+                    y=path, mode="lines",
+                    line=dict(width=1, color="rgba(78, 141, 245, 0.25)"),
+                    hoverinfo="skip"
+                ))
+            fig.add_hline(
+                y=account_size * (1 - RUIN_DRAWDOWN),
+                line=dict(color="red", width=2, dash="dash"),
+                annotation_text="Ruin"
+            )
+            fig.update_layout(
+                title=f"{len(simulation['sample_paths'])} of {paths:,} Simulated Equity Curves",
+                xaxis_title="Trade",
+                yaxis_title="Equity",
+                showlegend=False,
+                height=350,
+                margin=dict(l=0, r=0, t=30, b=0)
+            )
+            st.plotly_chart(fig, width="stretch")
+            
+            percentiles_df = pd.DataFrame({
+                "Percentile": [f"{p}th" for p in simulation['terminal_percentiles']],
+                "Final Equity": list(simulation['terminal_percentiles'].values()),
+                "Max Drawdown": [d * 100 for d in simulation['drawdown_percentiles'].values()]
+            })
+            st.dataframe(
+                percentiles_df,
+                width="stretch",
+                hide_index=True,
+                column_config={
+                    "Final Equity": st.column_config.NumberColumn(format="$%.0f"),
+                    "Max Drawdown": st.column_config.NumberColumn(format="%.1f%%")
+                }
+            )
+            
+            # Check how often these stops and targets were actually hit in the stored history
+            st.markdown("### Historical Backtest")
+            
+            horizon = st.number_input(
+                "Max Holding Days", min_value=1, max_value=60, value=MAX_HOLD_DAYS, step=1,
+                help="Trades that reach neither the stop nor the target are closed at this day's close"
+            )
+            with span('backtest', symbol=selected_symbol, horizon=horizon):
+                backtest = backtest_symbol(selected_symbol, horizon=int(horizon))
+            
+            if backtest is None:
+                st.info("Not enough stored history to backtest this contract.")
+            else:
+                st.caption(
+                    f"{backtest['entries']} daily entries at the close; a stop and target hit on the same day "
+                    f"count as a stop. Rows are ATR multipliers for the stop, columns are R-multiple targets."
+                )
+                r_labels = [f"{r}R" for r in R_MULTIPLES]
+                atr_labels = [f"{m} ATR" for m in ATR_MULTIPLIERS]
+                
+                backtest_tabs = st.tabs(["Long", "Short"])
+                for d, tab in enumerate(backtest_tabs):
+                    with tab:
+                        heat_col1, heat_col2 = st.columns(2)
+                        for col, key, title, fmt, scale in (
+                            (heat_col1, 'target_rate', "Target Hit Rate", ".0%", "Blues"),
+                            (heat_col2, 'expectancy_r', "Expectancy (R)", ".2f", "RdYlGn")
+                        ):
+                            values = backtest[key][:, :, d]
+                            fig = go.Figure(go.Heatmap(
+                                z=values, x=r_labels, y=atr_labels,
+                                colorscale=scale,
+                                zmid=0 if key == 'expectancy_r' else None,
+                                text=[[format(v, fmt) for v in row] for row in values],
+                                texttemplate="%{text}",
+                                showscale=False
+                            ))
+                            fig.update_layout(title=title, height=300, margin=dict(l=0, r=0, t=30, b=0))
+                            with col:
+                                st.plotly_chart(fig, width="stretch")
+            
         else:
             st.info("Please select a futures contract to see position sizing calculations.")
 
+# Portfolio Page
+elif page == "Portfolio":
+    st.title("Portfolio Risk")
+    st.markdown("### Aggregate notional, margin and correlation-adjusted risk for a book of positions")
+    
+    account_size = st.number_input(
+        "Account Size ($)", min_value=1000.0, value=100000.0, step=1000.0, key="portfolio_account_size"
+    )
+    
+    # The book is kept in the session so each edit only updates the legs that changed
+    refresh = st.button("Refresh market data")
+    if refresh or "portfolio" not in st.session_state:
+        st.session_state.portfolio = Portfolio(account_size, shared_snapshot)
+    portfolio = st.session_state.portfolio
+    portfolio.account_size = account_size
+    
+    contract_symbols = {f"{future['name']} ({future['ticker']})": future['symbol'] for future in CONTRACTS}
+    if "portfolio_rows" not in st.session_state:
+        st.session_state.portfolio_rows = pd.DataFrame({
+            "Contract": pd.Series(dtype=str),
+            "Contracts": pd.Series(dtype="i8")
+        })
+    
+    st.markdown("### Positions")
+    edited_rows = st.data_editor(
+        st.session_state.portfolio_rows,
+        num_rows="dynamic",
+        key="portfolio_editor",
+        width="stretch",
+        hide_index=True,
+        column_config={
+            "Contract": st.column_config.SelectboxColumn(options=list(contract_symbols), required=True),
+            "Contracts": st.column_config.NumberColumn(
+                step=1, default=1, help="Negative for a short position"
+            )
+        }
+    )
+    
+    # Combine rows for the same contract, then apply only what differs from the book
+    desired = {}
+    for label, contracts in zip(edited_rows["Contract"], edited_rows["Contracts"]):
+        if label in contract_symbols and pd.notna(contracts) and contracts != 0:
+            symbol = contract_symbols[label]
+            desired[symbol] = desired.get(symbol, 0) + int(contracts)
+    
+    with span('portfolio', legs=len(desired)):
+        for symbol in set(portfolio.positions) - set(desired):
+            portfolio.remove_position(symbol)
+        for symbol, contracts in desired.items():
+            portfolio.set_position(symbol, contracts)
+        summary = portfolio.summary()
+    
+    if not desired:
+        st.info("Add positions above to see the portfolio's risk.")
+    else:
+        if summary['missing_data']:
+            st.warning(
+                f"No price or ATR for {', '.join(summary['missing_data'])}. The totals leave out their "
+                "notional or risk; try Refresh market data."
+            )
+
+        st.markdown("### Portfolio Totals")
+        total_cols = st.columns(3)
+        total_cols[0].metric("Gross Notional", f"${summary['gross_notional']:,.0f}")
+        total_cols[1].metric(
+            "Net Notional", f"{'-' if summary['net_notional'] < 0 else ''}${abs(summary['net_notional']):,.0f}"
+        )
+        total_cols[2].metric(
+            "SPAN Margin (Approx)", f"${summary['margin']:,.0f}",
+            f"{summary['margin_usage']:.1%} of account", delta_color="off"
+        )
+        
+        risk_cols = st.columns(3)
+        risk_cols[0].metric("ATR Risk (Sum of Legs)", f"${summary['atr_risk']:,.0f}")
+        risk_cols[1].metric("Correlation-Adjusted Risk", f"${summary['correlated_risk']:,.0f}")
+        ratio = summary['diversification_ratio']
+        risk_cols[2].metric("Diversification Ratio", f"{ratio:.2f}" if ratio else "N/A")
+        
+        st.caption(
+            "Leg risk is contracts x multiplier x 14-day ATR. Correlation-adjusted risk nets the legs through "
+            "the correlations of their daily returns over the last year."
+        )
+        
+        st.markdown("### Legs")
+        st.dataframe(
+            portfolio.legs_df(),
+            width="stretch",
+            hide_index=True,
+            column_config={
+                "symbol": "Symbol",
+                "contracts": "Contracts",
+                "price": st.column_config.NumberColumn("Price", format="$%.2f"),
+                "notional": st.column_config.NumberColumn("Notional", format="$%.0f"),
+                "margin": st.column_config.NumberColumn("Margin", format="$%.0f"),
+                "atr_risk": st.column_config.NumberColumn("ATR Risk", format="$%.0f"),
+                "risk_contribution": st.column_config.NumberColumn(
+                    "Risk Contribution", format="$%.0f",
+                    help="Share of the correlation-adjusted risk; hedging legs are negative"
+                )
+            }
+        )
+
+    # Ranked once per daily update of the correlation cache, so this is only a lookup
+    st.markdown("### Most Correlated Contracts")
+    pairs = portfolio.correlations.top_pairs(10, absolute=True)
+    if pairs:
+        st.dataframe(
+            pd.DataFrame(pairs, columns=["First", "Second", "Correlation"]),
+            width="stretch",
+            hide_index=True,
+            column_config={"Correlation": st.column_config.NumberColumn(format="%.2f")}
+        )
+    else:
+        st.info("Correlations appear once daily bars have been stored.")
+
 # Add disclaimers and footer
 st.markdown("---")
 st.markdown(
@@ -646,3 +749,18 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+# Optional diagnostics panel showing where time went in this and earlier runs
+if st.sidebar.checkbox("Show diagnostics", value=False):
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.markdown("**Stage timings (ms)**")
+        st.dataframe(pd.DataFrame(get_stage_summary()), width="stretch", hide_index=True)
+        
+        st.markdown("**Per-symbol fetches**")
+        st.dataframe(pd.DataFrame(get_symbol_counters()), width="stretch", hide_index=True)
+        
+        st.markdown("**Circuit breakers**")
+        st.dataframe(pd.DataFrame(BREAKERS.summary()), width="stretch", hide_index=True)
+        
+        if st.button("Reset diagnostics"):
+            reset_diagnostics()
@@ -0,0 +1,58 @@
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from futures_data import (
+    get_current_price,
+    calculate_atr,
+    get_market_snapshot,
+    get_all_futures_with_market_data,
+    MAX_FETCH_WORKERS,
+    REQUEST_TIMEOUT
+)
+
+# Blocking data layer calls allowed in flight at once across all coroutines
+MAX_CONCURRENT_REQUESTS = MAX_FETCH_WORKERS
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="async-market-data")
+_semaphores = weakref.WeakKeyDictionary()
+
+def _semaphore():
+    """Return the concurrency semaphore for the running event loop"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return semaphore
+
+async def _run_blocking(func, *args, **kwargs):
+    """Run a blocking data layer call on the shared executor without blocking the event loop
+
+    Callers beyond MAX_CONCURRENT_REQUESTS wait on the semaphore rather than
+    queueing work on the executor.
+    """
+    async with _semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+async def async_get_current_price(symbol, timeout=REQUEST_TIMEOUT):
+    """Get the current price for a given symbol without blocking the event loop"""
+    return await _run_blocking(get_current_price, symbol, timeout=timeout)
+
+async def async_calculate_atr(symbol, period=14, method='sma', timeout=REQUEST_TIMEOUT):
+    """Calculate the Average True Range (ATR) for a given symbol without blocking the event loop"""
+    return await _run_blocking(calculate_atr, symbol, period, method, timeout=timeout)
+
+async def async_get_market_snapshot(symbols=None, period=14):
+    """Fetch a market snapshot for symbols, all of FUTURES_DATA by default, without blocking the event loop"""
+    return await _run_blocking(get_market_snapshot, symbols, period)
+
+async def async_get_all_futures_with_market_data(snapshot=None):
+    """Get all futures with current market data without blocking the event loop
+
+    Only fetching the snapshot does I/O; the enrichment runs inline.
+    """
+    if snapshot is None:
+        snapshot = await async_get_market_snapshot()
+    return get_all_futures_with_market_data(snapshot)
@@ -0,0 +1,221 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+
+ATR_METHODS = ('sma', 'wilder', 'ema')
+
+def stack_bars(frames, days=None):
+    """Stack per-symbol bar DataFrames into (symbols x days) high, low and close arrays
+
+    Histories are right-aligned so every symbol's latest bar sits in the last
+    column; shorter histories are padded with NaN on the left. Only the last
+    `days` bars are kept when given.
+    """
+    if days is None:
+        days = max((len(frame) for frame in frames), default=0)
+
+    high = np.full((len(frames), days), np.nan)
+    low = np.full((len(frames), days), np.nan)
+    close = np.full((len(frames), days), np.nan)
+    for row, frame in enumerate(frames):
+        n = min(len(frame), days)
+        if n == 0:
+            continue
+        high[row, -n:] = frame['High'].to_numpy(dtype='f8')[-n:]
+        low[row, -n:] = frame['Low'].to_numpy(dtype='f8')[-n:]
+        close[row, -n:] = frame['Close'].to_numpy(dtype='f8')[-n:]
+    return high, low, close
+
+def true_range(high, low, close):
+    """Calculate the True Range for (symbols x days) arrays of bars
+
+    The first bar of each symbol has no previous close, so its True Range
+    is simply high - low.
+    """
+    high, low, close = np.atleast_2d(high, low, close)
+    prev_close = np.full_like(close, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+
+    # fmax ignores the missing previous close instead of propagating NaN
+    return np.fmax(
+        high - low,
+        np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    )
+
+def _rolling_mean(values, period):
+    """Rolling mean along the last axis, NaN unless the window is fully populated"""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+
+    window_sums = sums.copy()
+    window_sums[:, period:] -= sums[:, :-period]
+    window_counts = counts.copy()
+    window_counts[:, period:] -= counts[:, :-period]
+
+    with np.errstate(invalid='ignore'):
+        return np.where(window_counts == period, window_sums / period, np.nan)
+
+def compute_atr(high, low, close, period=14, method='sma'):
+    """Calculate ATR for every symbol and day of (symbols x days) bar arrays
+
+    method is one of:
+      - 'sma': simple moving average of the True Range
+      - 'wilder': Wilder's smoothing, alpha = 1 / period
+      - 'ema': exponential moving average, alpha = 2 / (period + 1)
+
+    The recursive methods are seeded with the SMA of the first full window.
+    1-D inputs are treated as a single symbol and return a 1-D result.
+    """
+    if method not in ATR_METHODS:
+        raise ValueError(f"Unknown ATR method '{method}', expected one of {ATR_METHODS}")
+    if period < 1:
+        raise ValueError("ATR period must be at least 1")
+
+    single = np.ndim(close) == 1
+    tr = true_range(high, low, close)
+    atr = _rolling_mean(tr, period)
+
+    if method != 'sma' and tr.shape[1] > 0:
+        alpha = 1.0 / period if method == 'wilder' else 2.0 / (period + 1)
+        seed = atr
+        atr = np.empty_like(tr)
+        prev = np.full(tr.shape[0], np.nan)
+        # The recursion runs over days while every step covers all symbols at once
+        for t in range(tr.shape[1]):
+            current = tr[:, t]
+            smoothed = prev + alpha * (current - prev)
+            prev = np.where(
+                np.isnan(prev),
+                seed[:, t],
+                np.where(np.isnan(current), prev, smoothed)
+            )
+            atr[:, t] = prev
+
+    return atr[0] if single else atr
+
+def latest_atr(high, low, close, period=14, method='sma'):
+    """Return the most recent ATR for each symbol, NaN where there is too little history"""
+    atr = compute_atr(np.atleast_2d(high), np.atleast_2d(low), np.atleast_2d(close), period, method)
+    if atr.shape[1] == 0:
+        return np.full(atr.shape[0], np.nan)
+    return atr[:, -1]
+
+class _ATRState:
+    """Running ATR state for a single symbol"""
+
+    __slots__ = ('date', 'close', 'window', 'tr_sum', 'count', 'smoothed', 'undo')
+
+    def __init__(self, period):
+        self.date = None
+        self.close = None
+        self.window = deque(maxlen=period)
+        self.tr_sum = 0.0
+        self.count = 0
+        self.smoothed = None
+        self.undo = None
+
+class StreamingATR:
+    """Incremental ATR for many symbols, updated in constant time per bar
+
+    Each symbol keeps its previous close, the last `period` True Range values
+    with their running sum (SMA) and the smoothed value (Wilder/EMA). A bar
+    with the same date as the last one replaces it, so a partial session can
+    be revised as it progresses.
+    """
+
+    def __init__(self, period=14, method='sma'):
+        if method not in ATR_METHODS:
+            raise ValueError(f"Unknown ATR method '{method}', expected one of {ATR_METHODS}")
+        self.period = period
+        self.method = method
+        self._alpha = 1.0 / period if method == 'wilder' else 2.0 / (period + 1)
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, state, high, low, close):
+        """Add one bar to a symbol's state"""
+        range_ = high - low
+        if state.close is None:
+            true_range = range_
+        else:
+            true_range = max(range_, abs(high - state.close), abs(low - state.close))
+
+        evicted = state.window[0] if len(state.window) == self.period else None
+        state.undo = (state.close, evicted, state.tr_sum, state.count, state.smoothed)
+
+        state.window.append(true_range)
+        state.tr_sum += true_range - (evicted or 0.0)
+        state.count += 1
+        state.close = close
+
+        # Re-sum once per window so floating point drift cannot build up
+        if state.count % self.period == 0:
+            state.tr_sum = math.fsum(state.window)
+
+        if self.method != 'sma' and state.count >= self.period:
+            if state.smoothed is None:
+                state.smoothed = state.tr_sum / self.period
+            else:
+                state.smoothed += self._alpha * (true_range - state.smoothed)
+
+    def _revert(self, state):
+        """Undo the most recent bar of a symbol's state"""
+        state.close, evicted, state.tr_sum, state.count, state.smoothed = state.undo
+        state.window.pop()
+        if evicted is not None:
+            state.window.appendleft(evicted)
+        state.undo = None
+
+    def _value(self, state):
+        if state.count < self.period:
+            return None
+        if self.method == 'sma':
+            return state.tr_sum / self.period
+        return state.smoothed
+
+    def update(self, symbol, date, high, low, close):
+        """Add or revise a bar for a symbol and return its updated ATR
+
+        Bars older than the last one seen are ignored. Returns None until
+        `period` bars have been seen.
+        """
+        with self._lock:
+            state = self._states.get(symbol)
+            if state is None:
+                state = self._states[symbol] = _ATRState(self.period)
+
+            if state.date is not None and date < state.date:
+                return self._value(state)
+            if state.date is not None and date == state.date and state.undo is not None:
+                self._revert(state)
+
+            self._apply(state, float(high), float(low), float(close))
+            state.date = date
+            return self._value(state)
+
+    def update_from_bars(self, symbol, bars):
+        """Feed the bars of a DataFrame that are not older than the last bar seen"""
+        last_date = self.last_date(symbol)
+        if last_date is not None:
+            bars = bars[bars.index >= last_date]
+        value = self.get(symbol)
+        for date, high, low, close in zip(bars.index, bars['High'], bars['Low'], bars['Close']):
+            value = self.update(symbol, date, high, low, close)
+        return value
+
+    def get(self, symbol):
+        """Return the current ATR for a symbol, or None if it is not warmed up"""
+        with self._lock:
+            state = self._states.get(symbol)
+            return None if state is None else self._value(state)
+
+    def last_date(self, symbol):
+        """Return the date of the last bar seen for a symbol"""
+        with self._lock:
+            state = self._states.get(symbol)
+            return None if state is None else state.date
+
+    def __contains__(self, symbol):
+        return symbol in self._states
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+import bar_store
+from atr import compute_atr
+from futures_data import update_bar_store, ATR_MULTIPLIERS, R_MULTIPLES, LONG, SHORT
+
+MAX_HOLD_DAYS = 20  # trades still open after this many bars are closed at that bar's close
+
+def _first_reach(running_max, thresholds):
+    """Return the first bar index at which running_max reaches each threshold
+
+    running_max has shape (entries, bars, directions) and never decreases
+    along the bars axis, so the first bar at or above a threshold is the
+    number of bars still below it. thresholds of any shape are broadcast
+    between the entries and directions axes. Returns `bars` where a
+    threshold is never reached.
+    """
+    thresholds = np.asarray(thresholds, dtype='f8')
+    expanded = running_max.reshape(running_max.shape[:2] + (1,) * thresholds.ndim + running_max.shape[2:])
+    return (expanded < thresholds[..., None]).sum(axis=1)
+
+def backtest_stop_targets(high, low, close, period=14, atr_multipliers=ATR_MULTIPLIERS,
+                          r_multiples=R_MULTIPLES, directions=(LONG, SHORT), horizon=MAX_HOLD_DAYS,
+                          method='sma'):
+    """Replay daily bars and check whether each ATR stop or R-multiple target was hit first
+
+    Every bar with an ATR is an entry at its close, with the stop
+    atr_multiplier x ATR away and the target r_multiple times further than
+    the stop on the other side. The following `horizon` bars decide the
+    outcome: target first wins r_multiple R, stop first (or both in the
+    same bar) loses 1R, and neither closes at the last bar's close. Stops
+    and targets fill at their levels. All entries and parameters are
+    evaluated at once; there is no loop over bars.
+
+    Returns None without enough bars, else a dict with `entries` and arrays
+    of shape (atr_multipliers, r_multiples, directions):
+      - target_rate, stop_rate, timeout_rate: share of entries per outcome
+      - expectancy_r: mean result in R
+      - average_bars: mean bars held
+    """
+    high = np.asarray(high, dtype='f8')
+    low = np.asarray(low, dtype='f8')
+    close = np.asarray(close, dtype='f8')
+    atr = compute_atr(high, low, close, period, method)
+
+    # Entries need an ATR and a full holding window after them
+    candidates = atr[:max(len(close) - horizon, 0)]
+    entries = np.flatnonzero(~np.isnan(candidates) & (candidates > 0))
+    if len(entries) == 0:
+        return None
+
+    window = entries[:, None] + np.arange(1, horizon + 1)
+    entry_price = close[entries][:, None]
+    entry_atr = atr[entries][:, None]
+    up = (high[window] - entry_price) / entry_atr
+    down = (entry_price - low[window]) / entry_atr
+
+    # Favourable and adverse excursions in ATRs, as running maxima over the window
+    direction = np.asarray(directions)
+    is_long = direction == LONG
+    favourable = np.maximum.accumulate(np.where(is_long, up[..., None], down[..., None]), axis=1)
+    adverse = np.maximum.accumulate(np.where(is_long, down[..., None], up[..., None]), axis=1)
+
+    atr_multiple = np.asarray(atr_multipliers, dtype='f8')
+    r_multiple = np.asarray(r_multiples, dtype='f8')
+    stop_bar = _first_reach(adverse, atr_multiple)[:, :, None, :]  # (entries, M, 1, D)
+    target_bar = _first_reach(favourable, atr_multiple[:, None] * r_multiple)  # (entries, M, R, D)
+
+    target_first = target_bar < stop_bar
+    stopped = ~target_first & (stop_bar < horizon)
+    timed_out = ~(target_first | stopped)
+
+    # Trades still open at the horizon are marked to that close, in R
+    exit_move = ((close[entries + horizon] - close[entries]) / atr[entries])[:, None, None, None]
+    open_result = exit_move * direction / atr_multiple[:, None, None]
+    result = np.where(target_first, r_multiple[:, None], np.where(stopped, -1.0, open_result))
+    bars_held = np.where(target_first, target_bar + 1, np.where(stopped, stop_bar + 1, horizon))
+
+    return {
+        'entries': len(entries),
+        'target_rate': target_first.mean(axis=0),
+        'stop_rate': stopped.mean(axis=0),
+        'timeout_rate': timed_out.mean(axis=0),
+        'expectancy_r': result.mean(axis=0),
+        'average_bars': bars_held.mean(axis=0)
+    }
+
+def backtest_symbol(symbol, period=14, atr_multipliers=ATR_MULTIPLIERS, r_multiples=R_MULTIPLES,
+                    directions=(LONG, SHORT), horizon=MAX_HOLD_DAYS, method='sma'):
+    """Backtest stops and targets over a symbol's stored bars, downloading them if needed"""
+    bars = bar_store.load_bars(symbol)
+    if bars is None:
+        update_bar_store([symbol])
+        bars = bar_store.load_bars(symbol)
+    if bars is None:
+        return None
+    return backtest_stop_targets(
+        bars['high'], bars['low'], bars['close'], period, atr_multipliers, r_multiples, directions, horizon, method
+    )
+
+def backtest_grid_df(result, atr_multipliers=ATR_MULTIPLIERS, r_multiples=R_MULTIPLES, directions=(LONG, SHORT)):
+    """Return a backtest result as a tidy DataFrame with one row per ATR multiplier, R-multiple and direction"""
+    index = np.indices(result['target_rate'].shape).reshape(3, -1)
+    columns = {
+        'direction': np.where(np.asarray(directions)[index[2]] == LONG, 'long', 'short'),
+        'atr_multiplier': np.asarray(atr_multipliers, dtype='f8')[index[0]],
+        'r_multiple': np.asarray(r_multiples, dtype='f8')[index[1]]
+    }
+    for name in ('target_rate', 'stop_rate', 'timeout_rate', 'expectancy_r', 'average_bars'):
+        columns[name] = result[name].ravel()
+    return pd.DataFrame(columns)
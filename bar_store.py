@@ -0,0 +1,110 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from providers import get_provider
+
+# Root of the bar store, which holds one .npy file of daily bars per symbol.
+# Each market data provider in use writes to its own subdirectory, see
+# store_directory(), so replayed data never mixes with live data
+BAR_STORE_DIR = os.environ.get(
+    "FUTURES_BAR_STORE", os.path.join(os.path.expanduser("~"), ".futurecalculator", "bars")
+)
+
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8')
+])
+
+_write_lock = threading.Lock()
+
+def atomic_write(path, write, mode='wb'):
+    """Write a file by calling write(f) on a temporary file and swapping it in
+
+    Readers never see a partial file, and a failed write leaves the old one.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def store_directory():
+    """Return the bar directory of the market data provider currently in use"""
+    return os.path.join(BAR_STORE_DIR, get_provider().store_name)
+
+def _bar_path(symbol, directory=None):
+    """Return the file path used to store a symbol's bars, by default in store_directory()"""
+    filename = symbol.replace('=', '_').replace('/', '_') + '.npy'
+    return os.path.join(directory or store_directory(), filename)
+
+def load_bars(symbol, directory=None):
+    """Return the stored bars for a symbol as a read-only memory-mapped array"""
+    path = _bar_path(symbol, directory)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r')
+
+def date_range(symbol, directory=None):
+    """Return the (first, last) stored dates for a symbol, or (None, None)"""
+    bars = load_bars(symbol, directory)
+    if bars is None or len(bars) == 0:
+        return None, None
+    return bars['date'][0].item(), bars['date'][-1].item()
+
+def frame_to_bars(frame):
+    """Convert a DataFrame of daily bars into a structured bar array"""
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+
+    bars = np.empty(len(frame), dtype=BAR_DTYPE)
+    bars['date'] = index.values.astype('datetime64[D]')
+    bars['open'] = frame['Open'].to_numpy(dtype='f8')
+    bars['high'] = frame['High'].to_numpy(dtype='f8')
+    bars['low'] = frame['Low'].to_numpy(dtype='f8')
+    bars['close'] = frame['Close'].to_numpy(dtype='f8')
+    return bars
+
+def bars_to_frame(bars):
+    """Convert a structured bar array into a DataFrame indexed by date"""
+    return pd.DataFrame(
+        {
+            'Open': bars['open'],
+            'High': bars['high'],
+            'Low': bars['low'],
+            'Close': bars['close']
+        },
+        index=pd.DatetimeIndex(bars['date'].astype('datetime64[ns]'), name='Date')
+    )
+
+def read_bars(symbol, directory=None):
+    """Return the stored bars for a symbol as a DataFrame, or None"""
+    bars = load_bars(symbol, directory)
+    if bars is None or len(bars) == 0:
+        return None
+    return bars_to_frame(bars)
+
+def merge_bars(symbol, frame, directory=None):
+    """Merge downloaded bars into the store, replacing any overlapping dates"""
+    new_bars = frame_to_bars(frame)
+    if len(new_bars) == 0:
+        return
+    new_bars = np.sort(new_bars, order='date')
+
+    with _write_lock:
+        existing = load_bars(symbol, directory)
+        if existing is not None:
+            keep = existing[existing['date'] < new_bars['date'][0]]
+            new_bars = np.concatenate([keep, new_bars])
+
+        atomic_write(_bar_path(symbol, directory), lambda f: np.save(f, new_bars))
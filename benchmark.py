@@ -0,0 +1,222 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import bar_store
+import providers
+import futures_data as fd
+from atr import compute_atr, StreamingATR, ATR_METHODS
+
+# Synthetic history is anchored to a fixed date so every run replays the same bars
+FIXTURE_END_DATE = "2024-12-31"
+FIXTURE_DAYS = 300
+LONG_HISTORY_DAYS = 5000
+DEFAULT_SIZES = (40, 1000, 10000)
+REGRESSION_THRESHOLD = 1.2  # flag scenarios that got this much slower
+
+def make_synthetic_fixtures(directory, symbols, days=FIXTURE_DAYS, seed=0):
+    """Write random-walk daily bars for symbols as replay fixtures"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=FIXTURE_END_DATE, periods=days)
+    bars = {}
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+        open_ = close * (1 + rng.normal(0, 0.003, days))
+        spread = close * rng.uniform(0.002, 0.02, days)
+        bars[symbol] = pd.DataFrame(
+            {
+                'Open': open_,
+                'High': np.maximum(open_, close) + spread / 2,
+                'Low': np.minimum(open_, close) - spread / 2,
+                'Close': close
+            },
+            index=index
+        )
+    providers.record_bars(bars, directory)
+    return bars
+
+def synthetic_symbols(size):
+    """Return `size` symbols: the real contracts first, then synthetic ones"""
+    symbols = list(fd.CONTRACTS_BY_SYMBOL)[:size]
+    symbols += [f"SYN{i:05d}=F" for i in range(size - len(symbols))]
+    return symbols
+
+def measure(name, run, repeats, setup=None, size=None):
+    """Time `run` over several repeats, then trace one extra run for memory use
+
+    Wall times come from untraced runs because tracemalloc slows Python down.
+    """
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.statistics('filename')
+
+    result = {
+        'name': name,
+        'size': size,
+        'repeats': repeats,
+        'wall_time_s': {
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.mean(times)
+        },
+        'net_allocated_blocks': sum(stat.count for stat in stats),
+        'net_allocated_bytes': sum(stat.size for stat in stats),
+        'peak_traced_bytes': peak
+    }
+    print(f"{name:<32} size={str(size):>6}  median={result['wall_time_s']['median'] * 1000:9.2f} ms  "
+          f"peak={peak / 1e6:8.2f} MB", flush=True)
+    return result
+
+def bench_table_refresh(repeats):
+    """Full Futures Table refresh from a cold in-memory cache and a warm bar store"""
+    def run():
+        snapshot = fd.get_market_snapshot()
+        df = fd.get_all_futures_with_market_data_df(snapshot)
+        fd.format_futures_table(df)
+
+    # Warm the bar store so the runs measure the steady state, not the first download
+    fd.get_market_snapshot()
+    return measure('table_refresh', run, repeats, setup=fd.MARKET_DATA_CACHE.clear, size=len(fd.CONTRACTS))
+
+def bench_calculator_recompute(repeats):
+    """Single-contract recompute as the calculator page does on a slider change"""
+    future = fd.CONTRACTS[0]
+
+    def run():
+        snapshot = fd.get_market_snapshot([future['symbol']])
+        price, atr = snapshot.price(future['symbol']), snapshot.atr(future['symbol'])
+        grid = fd.calculate_stop_target_grid([price], [atr], [future['multiplier']])
+        fd.calculate_r_multiples(grid['stop_loss_amount'][0, 3, 0, 0])
+
+    run()
+    return measure('calculator_recompute', run, repeats, size=1)
+
+def bench_atr_long_history(repeats, symbols=40, days=LONG_HISTORY_DAYS):
+    """Vectorized and streaming ATR over long synthetic histories"""
+    rng = np.random.default_rng(1)
+    close = 100 + np.cumsum(rng.normal(0, 1, (symbols, days)), axis=1)
+    high = close + rng.uniform(0, 2, (symbols, days))
+    low = close - rng.uniform(0, 2, (symbols, days))
+
+    results = []
+    for method in ATR_METHODS:
+        results.append(measure(
+            f'atr_long_history_{method}',
+            lambda: compute_atr(high, low, close, 14, method),
+            repeats,
+            size=symbols * days
+        ))
+
+    index = pd.bdate_range(end=FIXTURE_END_DATE, periods=days)
+    frame = pd.DataFrame({'High': high[0], 'Low': low[0], 'Close': close[0]}, index=index)
+    results.append(measure(
+        'atr_streaming_seed',
+        lambda: StreamingATR(14).update_from_bars('X', frame),
+        repeats,
+        size=days
+    ))
+    return results
+
+def bench_universe(size, repeats):
+    """Fetch, ATR and stop/target grid for a synthetic universe of `size` contracts"""
+    symbols = synthetic_symbols(size)
+    multipliers = np.resize(fd.CONTRACT_COLUMNS['multiplier'], size)
+
+    def run():
+        market_data = fd.fetch_market_data(symbols, total_timeout=3600)
+        prices = np.array([market_data[symbol][0] for symbol in symbols], dtype='f8')
+        atrs = np.array([market_data[symbol][1] for symbol in symbols], dtype='f8')
+        fd.calculate_stop_target_grid(prices, atrs, multipliers)
+        return market_data
+
+    # Warm the bar store, then check that the deadline did not cut the run short
+    missing = sum(1 for price, _ in run().values() if price is None)
+    if missing:
+        print(f"warning: {missing} of {size} symbols returned no data", file=sys.stderr)
+    return measure('universe_refresh', run, repeats, size=size)
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print median time ratios against a previous results file; return the regressions"""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        before = baseline.get((result['name'], result['size']))
+        if before is None:
+            continue
+        ratio = result['wall_time_s']['median'] / before['wall_time_s']['median']
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{result['name']:<32} size={str(result['size']):>6}  {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+def main():
+    """Run the benchmarks and print, save or compare the results"""
+    parser = argparse.ArgumentParser(description="Benchmark the market data pipeline against local fixtures")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Universe sizes for the scaling benchmark")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous results file to check for regressions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="futures-bench-") as workdir:
+        fixtures_dir = os.path.join(workdir, "fixtures")
+        bar_store.BAR_STORE_DIR = os.path.join(workdir, "bars")
+        make_synthetic_fixtures(fixtures_dir, synthetic_symbols(max(args.sizes + [len(fd.CONTRACTS)])))
+        providers.set_provider(providers.ReplayProvider(fixtures_dir))
+
+        results = [bench_table_refresh(args.repeats), bench_calculator_recompute(args.repeats)]
+        results += bench_atr_long_history(args.repeats)
+        for size in sorted(args.sizes):
+            # Large universes are slow enough that fewer repeats still give a stable median
+            results.append(bench_universe(size, args.repeats if size <= 1000 else max(1, args.repeats // 5)))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'provider': providers.ReplayProvider.name
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
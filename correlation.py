@@ -0,0 +1,255 @@
+import threading
+import numpy as np
+import pandas as pd
+
+import bar_store
+from futures_data import CONTRACTS_BY_SYMBOL
+
+CORRELATION_WINDOW = 250  # trading days of daily returns in the rolling window
+
+class RollingCorrelation:
+    """Rolling covariance and correlation of daily returns across many symbols
+
+    The window's running sums are kept up to date with rank-1 updates: each
+    new trading day adds the outer product of its returns and drops the one
+    of the day leaving the window, so a new bar costs O(symbols^2) rather
+    than recomputing over the whole window. Days already in the window are
+    corrected the same way, by swapping the old row's outer product for the
+    new one: a revised last bar (a partial session downloaded again), or
+    bars for symbols that lagged behind the others.
+
+    covariance and correlation are published as float32 arrays that are
+    replaced, never modified, so readers can hold on to them. The sums stay
+    in float64 because float32 loses too much precision over repeated
+    downdates, and they are re-summed from the window once every `window`
+    updates to clear accumulated rounding error. A symbol's missing days
+    count as no move.
+    """
+
+    def __init__(self, symbols, window=CORRELATION_WINDOW):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.window = window
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every publish, including after a rebuild
+        self._clear()
+
+    def _clear(self):
+        """Empty the window"""
+        n = len(self.symbols)
+        self._rows = np.zeros((self.window, n))  # ring buffer of the window's daily returns
+        self._row_dates = np.zeros(self.window, dtype='datetime64[D]')  # date of each ring buffer row
+        self._head = 0  # ring buffer position of the next row
+        self._count = 0
+        self._sum = np.zeros(n)
+        self._outer = np.zeros((n, n))
+        self._updates = 0
+        self._signature = None
+        self.last_date = None
+        self.covariance = None
+        self.correlation = None
+        self._pair_order = {}
+
+    def _signatures(self):
+        """Return (first date, last date, last close) of every symbol's stored bars"""
+        signatures = []
+        for symbol in self.symbols:
+            bars = bar_store.load_bars(symbol)
+            if bars is None or len(bars) == 0:
+                signatures.append(None)
+            else:
+                signatures.append((bars['date'][0].item(), bars['date'][-1].item(), float(bars['close'][-1])))
+        return signatures
+
+    def _returns_since(self, since=None):
+        """Return a (dates x symbols) DataFrame of daily returns on and after `since`, all by default"""
+        columns = {}
+        for symbol in self.symbols:
+            bars = bar_store.load_bars(symbol)
+            if bars is None or len(bars) < 2:
+                continue
+            if since is not None:
+                # Keep the bar before `since` so its return can be calculated
+                start = max(int(np.searchsorted(bars['date'], np.datetime64(since, 'D'))) - 1, 0)
+                bars = bars[start:]
+            close = pd.Series(bars['close'], index=pd.DatetimeIndex(bars['date'].astype('datetime64[ns]')))
+            columns[symbol] = close.pct_change()
+
+        # Symbols without stored bars become float columns of no moves, not object NaNs
+        returns = pd.DataFrame(columns).reindex(columns=self.symbols).astype('f8').sort_index().fillna(0.0)
+        if since is not None:
+            returns = returns[returns.index >= pd.Timestamp(since)]
+        return returns
+
+    def _add_row(self, date, row):
+        """Push one day of returns into the window, dropping the oldest day when it is full"""
+        if self._count == self.window:
+            old = self._rows[self._head]
+            self._sum -= old
+            self._outer -= np.outer(old, old)
+        else:
+            self._count += 1
+        self._rows[self._head] = row
+        self._row_dates[self._head] = date
+        self._sum += row
+        self._outer += np.outer(row, row)
+        self._head = (self._head + 1) % self.window
+        self._updates += 1
+
+    def _replace_row(self, position, row):
+        """Swap the returns of a day already in the window for revised ones"""
+        old = self._rows[position]
+        self._sum += row - old
+        self._outer += np.outer(row, row) - np.outer(old, old)
+        self._rows[position] = row
+        self._updates += 1
+
+    def _positions(self):
+        """Return date -> ring buffer row for every day in the window"""
+        return {self._row_dates[i].item(): i for i in range(self._count)}
+
+    def _publish(self):
+        """Derive the float32 covariance and correlation matrices from the running sums"""
+        if self._updates >= self.window:
+            rows = self._rows if self._count == self.window else self._rows[:self._count]
+            self._sum = rows.sum(axis=0)
+            self._outer = rows.T @ rows
+            self._updates = 0
+
+        m = self._count
+        if m < 2:
+            covariance = np.zeros_like(self._outer)
+        else:
+            mean = self._sum / m
+            covariance = (self._outer - m * np.outer(mean, mean)) / (m - 1)
+        std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = covariance / np.outer(std, std)
+        correlation[~np.isfinite(correlation)] = 0.0
+        np.fill_diagonal(correlation, 1.0)
+
+        self.covariance = covariance.astype(np.float32)
+        self.correlation = np.clip(correlation, -1.0, 1.0).astype(np.float32)
+        self._pair_order = {}
+        self.version += 1
+
+    def rebuild(self):
+        """Recompute the window from every stored bar"""
+        with self._lock:
+            signature = self._signatures()
+            self._clear()
+            self._load(self._returns_since(), signature)
+
+    def _load(self, returns, signature):
+        """Fill the window from a returns frame and publish; call with _lock held"""
+        for date, row in zip(returns.index[-self.window:], returns.to_numpy()[-self.window:]):
+            self._add_row(date, row)
+        self.last_date = returns.index[-1].date() if len(returns) else None
+        self._signature = signature
+        self._publish()
+
+    def update(self):
+        """Apply bars added to the store since the last update; return whether anything changed
+
+        New trading days are rank-1 updates. Every symbol with new bars is
+        replayed from its own previous last date, so days in the window that
+        a lagging symbol had missed are corrected rather than left as no
+        move. The whole window is rebuilt when a symbol's history starts on
+        a different date, such as a symbol stored for the first time, or
+        when new bars bring a trading day the window does not have.
+        """
+        with self._lock:
+            signature = self._signatures()
+            if signature == self._signature:
+                return False
+
+            previous = self._signature
+            if previous is None or self.last_date is None or any(
+                (old[0] if old else None) != (new[0] if new else None)
+                for old, new in zip(previous, signature)
+            ):
+                self._clear()
+                self._load(self._returns_since(), signature)
+                return True
+
+            since = min(
+                [self.last_date] + [old[1] for old, new in zip(previous, signature) if old and old != new]
+            )
+            returns = self._returns_since(since)
+            positions = self._positions()
+            first_date = min(positions) if positions else self.last_date
+            for date, row in zip(returns.index, returns.to_numpy()):
+                day = date.date()
+                if day > self.last_date:
+                    self._add_row(day, row)
+                    self.last_date = day
+                elif day in positions:
+                    self._replace_row(positions[day], row)
+                elif day >= first_date:
+                    self._clear()
+                    self._load(self._returns_since(), signature)
+                    return True
+            self._signature = signature
+            self._publish()
+            return True
+
+    def has_data(self, symbol):
+        """Whether a symbol had any price variation in the window"""
+        covariance = self.covariance
+        i = self.index.get(symbol)
+        return covariance is not None and i is not None and covariance[i, i] > 0
+
+    def most_correlated(self, symbol, count=5, absolute=False):
+        """Return up to `count` (symbol, correlation) pairs most correlated with a symbol
+
+        With absolute=True strong negative correlations rank as high as
+        positive ones. Symbols without data in the window are left out.
+        """
+        correlation = self.correlation
+        i = self.index.get(symbol)
+        if correlation is None or i is None or not self.has_data(symbol):
+            return []
+
+        row = correlation[i].astype('f8')
+        key = np.abs(row) if absolute else row.copy()
+        key[i] = -np.inf
+        key[np.diag(self.covariance) <= 0] = -np.inf
+        count = min(count, int(np.isfinite(key).sum()))
+        if count <= 0:
+            return []
+        top = np.argpartition(-key, count - 1)[:count]
+        top = top[np.argsort(-key[top])]
+        return [(self.symbols[j], float(row[j])) for j in top]
+
+    def top_pairs(self, count=10, absolute=False):
+        """Return the `count` most correlated (symbol, symbol, correlation) pairs
+
+        Pairs are ranked once per published matrix, so repeated lookups are
+        a slice of the cached order.
+        """
+        with self._lock:
+            correlation = self.correlation
+            if correlation is None:
+                return []
+            order = self._pair_order.get(absolute)
+            if order is None:
+                first, second = np.triu_indices(len(self.symbols), 1)
+                values = correlation[first, second].astype('f8')
+                has_data = np.diag(self.covariance) > 0
+                keep = has_data[first] & has_data[second]
+                first, second, values = first[keep], second[keep], values[keep]
+                ranked = np.argsort(-(np.abs(values) if absolute else values), kind='stable')
+                order = self._pair_order[absolute] = (first[ranked], second[ranked], values[ranked])
+
+        first, second, values = order
+        return [
+            (self.symbols[i], self.symbols[j], float(value))
+            for i, j, value in zip(first[:count], second[:count], values[:count])
+        ]
+
+CORRELATIONS = RollingCorrelation(CONTRACTS_BY_SYMBOL)
+
+def get_correlations():
+    """Return the process-wide correlation cache, brought up to date with the bar store"""
+    CORRELATIONS.update()
+    return CORRELATIONS
@@ -1,7 +1,49 @@
 import pandas as pd
-import yfinance as yf
 import numpy as np
-from datetime import datetime, timedelta
+import sys
+import time
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+import bar_store
+from providers import get_provider
+from instrumentation import span, timed, record_fetch, record_timeout, record_retry, record_cache
+from resilience import BreakerRegistry, CircuitOpenError, retry_call
+from atr import stack_bars, latest_atr, StreamingATR
+
+# Limits for concurrent market data fetches
+MAX_FETCH_WORKERS = 8
+BATCH_CHUNK_SIZE = 20  # symbols per multi-ticker download
+REQUEST_TIMEOUT = 10  # seconds allowed for a single download request
+TOTAL_TIMEOUT = 30  # seconds allowed for a full refresh of all symbols
+
+# Upstream resilience: attempts per download within REQUEST_TIMEOUT, and the
+# consecutive failures after which a provider or symbol is skipped for a while
+RETRY_ATTEMPTS = 3
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30  # seconds before a failing provider or symbol is tried again
+BREAKERS = BreakerRegistry(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+# Days of history pulled the first time a symbol is added to the bar store
+BAR_HISTORY_DAYS = 365
+
+# Default stop loss and profit target grid
+ATR_MULTIPLIERS = (0.25, 0.5, 0.75, 1.0, 1.25, 1.5)
+R_MULTIPLES = (1, 2, 2.5, 3)
+
+# Direction signs used by the stop/target grid
+LONG = 1
+SHORT = -1
+
+# 14-day ATR kept up to date bar by bar for every symbol in the bar store
+ATR_STATE = StreamingATR(period=14)
+
+# Process-wide market data cache settings
+PRICE_TTL = 60  # seconds before a cached price is considered stale
+ATR_TTL = 60 * 60  # seconds before a cached ATR is considered stale
+CACHE_MAX_ENTRIES = 1024
 
 # Define futures data with all required information
 FUTURES_DATA = {
@@ -421,91 +463,587 @@ FUTURES_DATA = {
     ]
 }
 
-def get_all_futures():
-    """Return a list of all futures with their details"""
-    all_futures = []
+def _build_contract_registry():
+    """Build read-only contract records and their lookup indexes from FUTURES_DATA"""
+    contracts = []
+    by_section = {}
     for section, futures in FUTURES_DATA.items():
+        records = []
         for future in futures:
-            future_data = future.copy()
-            future_data['section'] = section
-            future_data['value_per_tick'] = future_data['tick_size'] * future_data['multiplier']
-            all_futures.append(future_data)
-    return all_futures
+            record = dict(future)
+            record['section'] = section
+            record['value_per_tick'] = record['tick_size'] * record['multiplier']
+            records.append(MappingProxyType(record))
+        by_section[section] = tuple(records)
+        contracts.extend(records)
+
+    by_symbol = {record['symbol']: record for record in contracts}
+    by_ticker = {record['ticker']: record for record in contracts}
+    return (
+        tuple(contracts),
+        MappingProxyType(by_symbol),
+        MappingProxyType(by_ticker),
+        MappingProxyType(by_section)
+    )
+
+# Contract registry built once at import; records are shared and read-only
+CONTRACTS, CONTRACTS_BY_SYMBOL, CONTRACTS_BY_TICKER, CONTRACTS_BY_SECTION = _build_contract_registry()
+
+# Fields of the columnar contract table, in column order
+CONTRACT_FIELDS = (
+    ('name', object),
+    ('symbol', object),
+    ('ticker', object),
+    ('notional_value', object),
+    ('tick_size', 'f8'),
+    ('multiplier', 'f8'),
+    ('etf_equivalent', object),
+    ('etf_shares_approx', object),
+    ('initial_margin', 'f8'),
+    ('section', object)
+)
+
+def _build_contract_columns():
+    """Build one read-only array per contract field, in registry order
+
+    Numeric fields are float64 arrays and string fields are object arrays of
+    interned strings, so repeated values such as sections share one object.
+    """
+    columns = {}
+    for field, dtype in CONTRACT_FIELDS:
+        if dtype is object:
+            values = [sys.intern(record[field]) for record in CONTRACTS]
+        else:
+            values = [record[field] for record in CONTRACTS]
+        columns[field] = np.array(values, dtype=dtype)
+    columns['value_per_tick'] = columns['tick_size'] * columns['multiplier']
+
+    for values in columns.values():
+        values.flags.writeable = False
+    return MappingProxyType(columns)
+
+# Struct-of-arrays view of the registry and the row of each symbol in it
+CONTRACT_COLUMNS = _build_contract_columns()
+CONTRACT_ROWS = MappingProxyType({symbol: row for row, symbol in enumerate(CONTRACT_COLUMNS['symbol'])})
+
+def get_all_futures():
+    """Return a list of all futures with their details
+
+    The records are shared read-only mappings; copy one with dict() before
+    adding fields to it.
+    """
+    return list(CONTRACTS)
 
 def get_all_futures_df():
-    """Return a dataframe of all futures with their details"""
-    return pd.DataFrame(get_all_futures())
+    """Return a dataframe of all futures with their details
+
+    The columns wrap the registry arrays without copying them.
+    """
+    return pd.DataFrame(dict(CONTRACT_COLUMNS), copy=False)
+
+def calculate_market_columns(prices, atrs, multiplier=None):
+    """Calculate market data columns for every contract with whole-array operations
+
+    prices and atrs are arrays in registry order with NaN for missing values;
+    pass the matching multipliers when they cover only some contracts.
+    """
+    if multiplier is None:
+        multiplier = CONTRACT_COLUMNS['multiplier']
+    return {
+        'current_price': prices,
+        'notional_exposure': prices * multiplier,
+        'atr': atrs,
+        'daily_pnl_range': atrs * multiplier
+    }
 
 def get_future_by_symbol(symbol):
-    """Get future details by symbol"""
-    all_futures = get_all_futures()
-    for future in all_futures:
-        if future['symbol'] == symbol:
-            return future
-    return None
+    """Get future details by Yahoo symbol, e.g. 'ES=F'"""
+    return CONTRACTS_BY_SYMBOL.get(symbol)
+
+def get_future_by_ticker(ticker):
+    """Get future details by ticker, e.g. '/ES'"""
+    return CONTRACTS_BY_TICKER.get(ticker)
+
+def get_futures_by_section(section):
+    """Get the futures in a section, e.g. 'Equity'"""
+    return CONTRACTS_BY_SECTION.get(section, ())
+
+def download_daily_bars(symbols, days, timeout=REQUEST_TIMEOUT):
+    """Download daily OHLC bars for several symbols in a single request
+
+    Bars come from the configured provider (see providers.get_provider).
+    Returns a dict of symbol -> DataFrame with Open, High, Low and Close
+    columns. Symbols without any data are left out.
+
+    Failed requests are retried with jittered backoff, all within `timeout`.
+    Each provider and symbol has a circuit breaker in BREAKERS: while the
+    provider's is open this raises CircuitOpenError without a request, and
+    symbols whose own breaker is open are left out.
+    """
+    provider = get_provider()
+    provider_breaker = BREAKERS.get(f"provider:{provider.name}")
+    if not provider_breaker.allow():
+        raise CircuitOpenError(f"{provider.name} is failing; skipping download of {len(symbols)} symbols")
+    symbols = [symbol for symbol in symbols if BREAKERS.get(f"symbol:{symbol}").allow()]
+    if not symbols:
+        return {}
+
+    def on_retry(attempt, error):
+        print(f"Retrying download of {', '.join(symbols)} (attempt {attempt + 1}) after: {error}")
+        for symbol in symbols:
+            record_retry(symbol)
+
+    start = time.perf_counter()
+    with span('download', provider=provider.name, symbols=len(symbols), days=days):
+        try:
+            bars = retry_call(
+                lambda: provider.download_daily_bars(symbols, days, timeout=timeout),
+                attempts=RETRY_ATTEMPTS,
+                timeout=timeout,
+                on_retry=on_retry
+            )
+        except Exception:
+            provider_breaker.record_failure()
+            for symbol in symbols:
+                record_fetch(symbol, time.perf_counter() - start, ok=False)
+            raise
 
-def calculate_atr(symbol, period=14):
+    provider_breaker.record_success()
+    latency = time.perf_counter() - start
+    for symbol in symbols:
+        breaker = BREAKERS.get(f"symbol:{symbol}")
+        if symbol in bars:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        record_fetch(symbol, latency, ok=symbol in bars)
+    return bars
+
+def _latest_atrs(frames, period=14, method='sma'):
+    """Calculate the latest ATR for a list of bar DataFrames in one vectorized pass"""
+    # SMA only looks at the last window; recursive methods need the full history to converge
+    days = period + 1 if method == 'sma' else None
+    high, low, close = stack_bars(frames, days)
+    return [None if np.isnan(value) else float(value)
+            for value in latest_atr(high, low, close, period, method)]
+
+def atr_from_bars(bars, period=14, method='sma'):
+    """Calculate the latest ATR from a DataFrame of daily bars"""
+    return _latest_atrs([bars], period, method)[0]
+
+def update_bar_store(symbols, days=BAR_HISTORY_DAYS, timeout=REQUEST_TIMEOUT):
+    """Download only the bars missing from the local store
+
+    Symbols not stored yet get `days` of history. Stored symbols only fetch
+    the tail since their last stored date, which is fetched again because
+    it may have been a partial session. Symbols that need the same window
+    share one batched download. New bars are also fed into ATR_STATE.
+    A failed download leaves the stored bars as they were, so symbols that
+    have them still get a result. Returns symbol -> DataFrame of stored bars.
+    """
+    today = get_provider().today()
+    groups = {}
+    for symbol in symbols:
+        _, last_date = bar_store.date_range(symbol)
+        lookback = days if last_date is None else (today - last_date).days + 1
+        groups.setdefault(lookback, []).append(symbol)
+
+    for lookback, group in groups.items():
+        for i in range(0, len(group), BATCH_CHUNK_SIZE):
+            chunk = group[i:i + BATCH_CHUNK_SIZE]
+            try:
+                bars = download_daily_bars(chunk, days=lookback, timeout=timeout)
+            except Exception as e:
+                print(f"Error downloading bars for {', '.join(chunk)}: {e}")
+                continue
+            for symbol, frame in bars.items():
+                bar_store.merge_bars(symbol, frame)
+
+    stored = {}
+    for symbol in symbols:
+        frame = bar_store.read_bars(symbol)
+        if frame is not None:
+            stored[symbol] = frame
+            ATR_STATE.update_from_bars(symbol, frame)
+    return stored
+
+def _uses_atr_state(period, method='sma'):
+    """Whether ATR_STATE already tracks the requested ATR"""
+    return period == ATR_STATE.period and method == ATR_STATE.method
+
+def calculate_atr(symbol, period=14, method='sma', timeout=REQUEST_TIMEOUT):
     """Calculate the Average True Range (ATR) for a given symbol"""
     try:
-        # Get data from Yahoo Finance
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=period*2)  # Get more data than needed to ensure we have enough
-        
-        data = yf.download(symbol, start=start_date, end=end_date)
-        
-        if data.empty:
+        bars = update_bar_store([symbol], timeout=timeout)
+        if symbol not in bars:
             return None
-        
-        # Calculate True Range
-        data['High-Low'] = data['High'] - data['Low']
-        data['High-PrevClose'] = abs(data['High'] - data['Close'].shift(1))
-        data['Low-PrevClose'] = abs(data['Low'] - data['Close'].shift(1))
-        
-        data['TR'] = data[['High-Low', 'High-PrevClose', 'Low-PrevClose']].max(axis=1)
-        
-        # Calculate ATR
-        data['ATR'] = data['TR'].rolling(window=period).mean()
-        
-        # Get the latest ATR value
-        latest_atr = data['ATR'].iloc[-1]
-        
-        return latest_atr
+        if _uses_atr_state(period, method):
+            return ATR_STATE.get(symbol)
+        return atr_from_bars(bars[symbol], period, method)
     except Exception as e:
         print(f"Error calculating ATR for {symbol}: {e}")
         return None
 
-def get_current_price(symbol):
+@timed('atr')
+def calculate_atrs(symbols=None, period=14, method='sma', timeout=REQUEST_TIMEOUT):
+    """Calculate the ATR for many symbols at once, all of FUTURES_DATA by default
+
+    Returns symbol -> ATR, with None for symbols without enough history.
+    """
+    if symbols is None:
+        symbols = list(CONTRACTS_BY_SYMBOL)
+    bars = update_bar_store(symbols, timeout=timeout)
+    stored = [symbol for symbol in symbols if symbol in bars]
+    atrs = dict.fromkeys(symbols)
+    atrs.update(zip(stored, _latest_atrs([bars[symbol] for symbol in stored], period, method)))
+    return atrs
+
+def get_current_price(symbol, timeout=REQUEST_TIMEOUT):
     """Get the current price for a given symbol"""
     try:
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(period="1d")
-        if not data.empty:
-            return data['Close'].iloc[-1]
+        bars = update_bar_store([symbol], timeout=timeout)
+        if symbol in bars:
+            return bars[symbol]['Close'].iloc[-1]
         return None
     except Exception as e:
         print(f"Error getting price for {symbol}: {e}")
         return None
 
-def calculate_notional_exposure(future):
+def calculate_notional_exposure(future, snapshot=None):
     """Calculate the notional exposure for a future contract"""
-    price = get_current_price(future['symbol'])
+    if snapshot is None:
+        snapshot = get_market_snapshot([future['symbol']])
+    price = snapshot.price(future['symbol'])
     if price:
         return price * future['multiplier']
     return None
 
-def calculate_daily_pnl_range(future):
+def calculate_daily_pnl_range(future, snapshot=None):
     """Calculate the approximate daily P&L range based on ATR"""
-    atr = calculate_atr(future['symbol'])
+    if snapshot is None:
+        snapshot = get_market_snapshot([future['symbol']])
+    atr = snapshot.atr(future['symbol'])
     if atr:
         return atr * future['multiplier']
     return None
 
-def get_all_futures_with_market_data():
+@timed('fetch')
+def fetch_market_data(symbols, period=14, include_atr=True, max_workers=MAX_FETCH_WORKERS,
+                      chunk_size=BATCH_CHUNK_SIZE, request_timeout=REQUEST_TIMEOUT,
+                      total_timeout=TOTAL_TIMEOUT):
+    """Fetch current price and ATR for many symbols concurrently
+
+    Each chunk of symbols brings the local bar store up to date with
+    batched downloads, and the price and ATR are both derived from the
+    stored bars. With include_atr=False the ATR is skipped and returned as
+    None. Returns a dict of symbol -> (price, atr).
+
+    request_timeout and the download retries apply to a whole chunk, so a
+    chunk that times out or comes back without some of its symbols has
+    those symbols fetched again one per request. One slow symbol then
+    costs only itself, at the price of extra requests. Symbols that still
+    fail, that run past request_timeout on their own, or that are pending
+    at the total deadline map to (None, None) so callers always get a
+    result for every symbol.
+    """
+    symbols = list(symbols)
+    results = {symbol: (None, None) for symbol in symbols}
+    chunks = [tuple(symbols[i:i + chunk_size]) for i in range(0, len(symbols), chunk_size)]
+    started = {}
+
+    def fetch(chunk):
+        started[chunk] = time.monotonic()
+        bars = update_bar_store(chunk, timeout=request_timeout)
+        stored = list(bars)
+        with span('atr', symbols=len(stored), period=period):
+            if include_atr and _uses_atr_state(period):
+                atrs = [ATR_STATE.get(symbol) for symbol in stored]
+            elif include_atr:
+                atrs = _latest_atrs([bars[symbol] for symbol in stored], period)
+            else:
+                atrs = [None] * len(stored)
+        return {
+            symbol: (bars[symbol]['Close'].iloc[-1], atr)
+            for symbol, atr in zip(stored, atrs)
+        }
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {executor.submit(fetch, chunk): chunk for chunk in chunks}
+
+    def fetch_individually(chunk, fetched):
+        """Resubmit a chunk's missing symbols one per request; False for a chunk of one"""
+        if len(chunk) < 2:
+            return False
+        for symbol in chunk:
+            if symbol not in fetched:
+                pending[executor.submit(fetch, (symbol,))] = (symbol,)
+        return True
+    deadline = time.monotonic() + total_timeout
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                print(f"Market data deadline reached with {len(pending)} chunks pending")
+                for chunk in pending.values():
+                    for symbol in chunk:
+                        record_timeout(symbol)
+                break
+
+            # Wake up at the total deadline or the next per-request expiry
+            wake_at = deadline
+            for chunk in pending.values():
+                if chunk in started:
+                    wake_at = min(wake_at, started[chunk] + request_timeout)
+            done, _ = wait(pending, timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                chunk = pending.pop(future)
+                fetched = {}
+                try:
+                    fetched = future.result()
+                    results.update(fetched)
+                except Exception as e:
+                    print(f"Error fetching market data for {', '.join(chunk)}: {e}")
+                fetch_individually(chunk, fetched)
+
+            # Give up on requests that have run past their own timeout
+            now = time.monotonic()
+            for future, chunk in list(pending.items()):
+                if chunk in started and now - started[chunk] >= request_timeout:
+                    del pending[future]
+                    if fetch_individually(chunk, {}):
+                        print(f"Timed out fetching market data for {', '.join(chunk)}; retrying one symbol at a time")
+                        continue
+                    print(f"Timed out fetching market data for {', '.join(chunk)}")
+                    for symbol in chunk:
+                        record_timeout(symbol)
+    finally:
+        # Do not block on stragglers; their results are simply discarded
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+class MarketDataCache:
+    """Thread-safe LRU cache of market data values with per-lookup TTLs
+
+    Entries are kept after they expire so callers can serve a stale value
+    while a refresh runs in the background.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl):
+        """Return (value, state) where state is 'fresh', 'stale' or 'missing'"""
+        with self._lock:
+            if key not in self._entries:
+                return None, 'missing'
+            value, stored_at = self._entries[key]
+            self._entries.move_to_end(key)
+        if time.monotonic() - stored_at < ttl:
+            return value, 'fresh'
+        return value, 'stale'
+
+    def set(self, key, value):
+        """Store a value and evict the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Shared by every Streamlit session in this process
+MARKET_DATA_CACHE = MarketDataCache()
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="market-data-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def _store_market_data(market_data, period, include_atr):
+    """Write fetched values into the cache without clobbering good values with failures"""
+    for symbol, (price, atr) in market_data.items():
+        fields = [(('price', symbol), price)]
+        if include_atr:
+            fields.append((('atr', symbol, period), atr))
+        for key, value in fields:
+            # Keep serving the last good value if a refresh failed
+            if value is None and MARKET_DATA_CACHE.get(key, 0)[0] is not None:
+                continue
+            MARKET_DATA_CACHE.set(key, value)
+
+def _refresh_in_background(symbols, period, include_atr):
+    """Refresh cached market data on a background thread, once per symbol at a time"""
+    with _refreshing_lock:
+        symbols = [s for s in symbols if (s, period, include_atr) not in _refreshing]
+        _refreshing.update((s, period, include_atr) for s in symbols)
+    if not symbols:
+        return
+
+    def refresh():
+        try:
+            market_data = fetch_market_data(symbols, period, include_atr=include_atr)
+            _store_market_data(market_data, period, include_atr)
+        except Exception as e:
+            print(f"Error refreshing market data: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.difference_update((s, period, include_atr) for s in symbols)
+
+    _refresh_executor.submit(refresh)
+
+def get_market_data(symbols, period=14):
+    """Get symbol -> (price, atr) from the process-wide cache
+
+    Missing symbols are fetched before returning. Expired values are
+    returned as-is while a background refresh replaces them, so repeated
+    calls within the TTLs make no network requests.
+    """
+    results = {}
+    fetch_now = []
+    stale_prices = []
+    stale_atrs = []
+    for symbol in symbols:
+        price, price_state = MARKET_DATA_CACHE.get(('price', symbol), PRICE_TTL)
+        atr, atr_state = MARKET_DATA_CACHE.get(('atr', symbol, period), ATR_TTL)
+        if 'missing' in (price_state, atr_state):
+            record_cache(symbol, hit=False)
+            fetch_now.append(symbol)
+            continue
+
+        record_cache(symbol, hit=True)
+        results[symbol] = (price, atr)
+        # An ATR refresh downloads enough bars to update the price as well
+        if atr_state == 'stale':
+            stale_atrs.append(symbol)
+        elif price_state == 'stale':
+            stale_prices.append(symbol)
+
+    if fetch_now:
+        market_data = fetch_market_data(fetch_now, period)
+        _store_market_data(market_data, period, include_atr=True)
+        results.update(market_data)
+    if stale_atrs:
+        _refresh_in_background(stale_atrs, period, include_atr=True)
+    if stale_prices:
+        _refresh_in_background(stale_prices, period, include_atr=False)
+
+    return {symbol: results[symbol] for symbol in symbols}
+
+class MarketSnapshot:
+    """Prices and ATRs for a set of symbols, captured once and shared by calculators
+
+    Calculators that take a snapshot do no I/O of their own. Missing values
+    are None.
+    """
+
+    def __init__(self, prices, atrs, as_of=None):
+        self.prices = prices
+        self.atrs = atrs
+        self.as_of = as_of or datetime.now()
+
+    def price(self, symbol):
+        """Return the price for a symbol, or None"""
+        return self.prices.get(symbol)
+
+    def atr(self, symbol):
+        """Return the ATR for a symbol, or None"""
+        return self.atrs.get(symbol)
+
+    def arrays(self, symbols):
+        """Return float arrays of prices and ATRs for symbols, NaN where missing"""
+        prices = np.array([self.prices.get(symbol) for symbol in symbols], dtype='f8')
+        atrs = np.array([self.atrs.get(symbol) for symbol in symbols], dtype='f8')
+        return prices, atrs
+
+    def __contains__(self, symbol):
+        """Whether the snapshot holds both a price and an ATR for a symbol"""
+        return self.prices.get(symbol) is not None and self.atrs.get(symbol) is not None
+
+def _snapshot_from_market_data(symbols, market_data, period):
+    """Build a MarketSnapshot from symbol -> (price, atr), preferring ATR_STATE"""
+    prices = {}
+    atrs = {}
+    for symbol in symbols:
+        price, atr = market_data[symbol]
+        if _uses_atr_state(period) and ATR_STATE.get(symbol) is not None:
+            atr = ATR_STATE.get(symbol)
+        prices[symbol] = price
+        atrs[symbol] = atr
+    return MarketSnapshot(prices, atrs)
+
+def get_market_snapshot(symbols=None, period=14):
+    """Fetch a market snapshot for symbols, all of FUTURES_DATA by default
+
+    Values come from the process-wide cache. For the default period the
+    ATR is taken from ATR_STATE when it has one, since that includes the
+    latest bar.
+    """
+    symbols = list(CONTRACTS_BY_SYMBOL) if symbols is None else list(symbols)
+    return _snapshot_from_market_data(symbols, get_market_data(symbols, period), period)
+
+def refresh_market_snapshot(symbols=None, period=14):
+    """Fetch a market snapshot for symbols now, ignoring cached values
+
+    The fetched values are written to the process-wide cache. A symbol whose
+    fetch failed keeps its last good cached value.
+    """
+    symbols = list(CONTRACTS_BY_SYMBOL) if symbols is None else list(symbols)
+    _store_market_data(fetch_market_data(symbols, period), period, include_atr=True)
+    market_data = {
+        symbol: (
+            MARKET_DATA_CACHE.get(('price', symbol), 0)[0],
+            MARKET_DATA_CACHE.get(('atr', symbol, period), 0)[0]
+        )
+        for symbol in symbols
+    }
+    return _snapshot_from_market_data(symbols, market_data, period)
+
+def related_symbols(symbol):
+    """Return the symbols a user is likely to look at after `symbol`
+
+    The other size of the same market (contracts sharing an ETF equivalent,
+    such as /ES and /MES) comes first, then the rest of the section.
+    """
+    future = CONTRACTS_BY_SYMBOL.get(symbol)
+    if future is None:
+        return []
+    others = [record for record in CONTRACTS_BY_SECTION[future['section']] if record['symbol'] != symbol]
+    pairs = [record['symbol'] for record in others if record['etf_equivalent'] == future['etf_equivalent']]
+    return pairs + [record['symbol'] for record in others if record['symbol'] not in pairs]
+
+def prefetch_market_data(symbols, period=14):
+    """Start fetching symbols that are not cached yet on a background thread
+
+    Returns immediately; later get_market_data() calls for these symbols
+    are then served from the cache.
+    """
+    missing = [
+        symbol for symbol in symbols
+        if MARKET_DATA_CACHE.get(('price', symbol), PRICE_TTL)[1] == 'missing'
+        or MARKET_DATA_CACHE.get(('atr', symbol, period), ATR_TTL)[1] == 'missing'
+    ]
+    if missing:
+        _refresh_in_background(missing, period, include_atr=True)
+
+@timed('enrichment')
+def get_all_futures_with_market_data(snapshot=None):
     """Get all futures with current market data"""
-    futures = get_all_futures()
+    if snapshot is None:
+        snapshot = get_market_snapshot()
+    futures = [dict(record) for record in CONTRACTS]
     for future in futures:
-        price = get_current_price(future['symbol'])
-        atr = calculate_atr(future['symbol'])
+        price = snapshot.price(future['symbol'])
+        atr = snapshot.atr(future['symbol'])
         
         if price:
             future['current_price'] = price
@@ -523,35 +1061,159 @@ def get_all_futures_with_market_data():
             
     return futures
 
-def get_stop_loss_levels(future, atr_multipliers=[0.5, 0.75, 1.0, 1.25, 1.5]):
-    """Calculate stop loss levels based on ATR multipliers"""
-    price = get_current_price(future['symbol'])
-    atr = calculate_atr(future['symbol'])
-    
+@timed('enrichment')
+def get_all_futures_with_market_data_df(snapshot=None):
+    """Return a dataframe of all futures with current market data
+
+    Missing prices and ATRs are NaN so every market data column stays numeric.
+    """
+    if snapshot is None:
+        snapshot = get_market_snapshot()
+    prices, atrs = snapshot.arrays(CONTRACT_COLUMNS['symbol'])
+
+    df = get_all_futures_df()
+    for column, values in calculate_market_columns(prices, atrs).items():
+        df[column] = values
+    return df
+
+def _section_market_data_df(section, snapshot):
+    """Return a dataframe of one section's futures with market data from a snapshot"""
+    df = get_all_futures_df()
+    df = df[df['section'] == section].reset_index(drop=True)
+    prices, atrs = snapshot.arrays(df['symbol'])
+    for column, values in calculate_market_columns(prices, atrs, df['multiplier'].to_numpy()).items():
+        df[column] = values
+    return df
+
+@timed('enrichment')
+def get_section_futures_with_market_data_df(section, snapshot=None, period=14):
+    """Return a dataframe of one section's futures with current market data
+
+    Without a snapshot only the section's own symbols are fetched, and the
+    result is kept per section for PRICE_TTL seconds so revisiting a tab
+    does no work.
+    """
+    if snapshot is not None:
+        return _section_market_data_df(section, snapshot)
+
+    key = ('section', section, period)
+    df, state = MARKET_DATA_CACHE.get(key, PRICE_TTL)
+    if state == 'fresh':
+        return df
+
+    symbols = [record['symbol'] for record in get_futures_by_section(section)]
+    df = _section_market_data_df(section, get_market_snapshot(symbols, period))
+    MARKET_DATA_CACHE.set(key, df)
+    return df
+
+@timed('formatting')
+def format_futures_table(df):
+    """Add the display columns for the Futures Table to a market data dataframe
+
+    Values stay numeric, with NaN where data is missing; the page formats
+    them through Streamlit column configs rather than converting to strings.
+    """
+    return df.assign(tick_value=df['value_per_tick'], atr_points=df['atr'])
+
+def calculate_stop_target_grid(prices, atrs, multipliers, atr_multipliers=ATR_MULTIPLIERS,
+                               r_multiples=R_MULTIPLES, directions=(LONG, SHORT)):
+    """Calculate stops and targets for every contract, ATR multiplier, R-multiple and direction
+
+    prices, atrs and multipliers are per-contract arrays; directions holds
+    LONG and/or SHORT. Returns a dict of arrays that all have the shape
+    (contracts, atr_multipliers, r_multiples, directions):
+      - stop_distance, stop_price, stop_loss_amount: stop in points, as a
+        price, and in dollars per contract
+      - target_distance, target_price, target_amount: the same for the
+        R-multiple profit target
+    Values that do not vary along an axis are broadcast views, not copies.
+    """
+    price = np.asarray(prices, dtype='f8')[:, None, None, None]
+    atr = np.asarray(atrs, dtype='f8')[:, None, None, None]
+    multiplier = np.asarray(multipliers, dtype='f8')[:, None, None, None]
+    atr_multiple = np.asarray(atr_multipliers, dtype='f8')[None, :, None, None]
+    r_multiple = np.asarray(r_multiples, dtype='f8')[None, None, :, None]
+    direction = np.asarray(directions, dtype='f8')[None, None, None, :]
+
+    stop_distance = atr * atr_multiple
+    stop_loss_amount = stop_distance * multiplier
+    target_distance = stop_distance * r_multiple
+    grid = {
+        'stop_distance': stop_distance,
+        'stop_price': price - direction * stop_distance,
+        'stop_loss_amount': stop_loss_amount,
+        'target_distance': target_distance,
+        'target_price': price + direction * target_distance,
+        'target_amount': stop_loss_amount * r_multiple
+    }
+
+    shape = np.broadcast_shapes(*(values.shape for values in grid.values()))
+    return {name: np.broadcast_to(values, shape) for name, values in grid.items()}
+
+def stop_target_grid_df(symbols, prices, atrs, multipliers, atr_multipliers=ATR_MULTIPLIERS,
+                        r_multiples=R_MULTIPLES, directions=(LONG, SHORT)):
+    """Return the stop/target grid as a tidy DataFrame with one row per combination"""
+    grid = calculate_stop_target_grid(prices, atrs, multipliers, atr_multipliers, r_multiples, directions)
+    index = np.indices(grid['stop_price'].shape).reshape(4, -1)
+
+    columns = {
+        'symbol': np.asarray(symbols, dtype=object)[index[0]],
+        'direction': np.where(np.asarray(directions)[index[3]] == LONG, 'long', 'short'),
+        'atr_multiplier': np.asarray(atr_multipliers, dtype='f8')[index[1]],
+        'r_multiple': np.asarray(r_multiples, dtype='f8')[index[2]]
+    }
+    for name, values in grid.items():
+        columns[name] = values.ravel()
+    return pd.DataFrame(columns)
+
+def calculate_risk_amount(account_size, risk_percentage):
+    """Calculate the dollars at risk for an account size and a risk percentage"""
+    return np.asarray(account_size, dtype='f8') * (np.asarray(risk_percentage, dtype='f8') / 100)
+
+def calculate_position_sizes(risk_amount, stop_loss_amount):
+    """Calculate the most contracts whose stop loss fits within the risk amount
+
+    Works element-wise on arrays that broadcast together. A valid stop
+    always sizes at least one contract; a zero, negative or missing stop
+    sizes none.
+    """
+    risk_amount = np.asarray(risk_amount, dtype='f8')
+    stop_loss_amount = np.asarray(stop_loss_amount, dtype='f8')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contracts = np.maximum(1, np.floor(risk_amount / stop_loss_amount))
+    return np.where(stop_loss_amount > 0, contracts, 0).astype('i8')
+
+def calculate_stop_loss_levels(future, price, atr, atr_multipliers=[0.5, 0.75, 1.0, 1.25, 1.5]):
+    """Calculate long stop loss levels from an explicit price and ATR"""
     if not price or not atr:
         return None
     
+    # Long position stops only, so a single R-multiple and direction is enough
+    grid = calculate_stop_target_grid([price], [atr], [future['multiplier']], atr_multipliers, [1], [LONG])
     stop_levels = {}
-    for multiplier in atr_multipliers:
-        stop_distance = atr * multiplier
-        stop_price = price - stop_distance  # For long position
-        stop_loss_amount = stop_distance * future['multiplier']
-        
+    for i, multiplier in enumerate(atr_multipliers):
         stop_levels[f"{multiplier} ATR"] = {
-            "stop_price": stop_price,
-            "stop_distance": stop_distance,
-            "stop_loss_amount": stop_loss_amount
+            "stop_price": float(grid['stop_price'][0, i, 0, 0]),
+            "stop_distance": float(grid['stop_distance'][0, i, 0, 0]),
+            "stop_loss_amount": float(grid['stop_loss_amount'][0, i, 0, 0])
         }
     
     return stop_levels
 
+def get_stop_loss_levels(future, atr_multipliers=[0.5, 0.75, 1.0, 1.25, 1.5], snapshot=None):
+    """Calculate stop loss levels based on ATR multipliers
+
+    Pass a snapshot from get_market_snapshot() to avoid fetching market data.
+    """
+    if snapshot is None:
+        snapshot = get_market_snapshot([future['symbol']])
+    symbol = future['symbol']
+    return calculate_stop_loss_levels(future, snapshot.price(symbol), snapshot.atr(symbol), atr_multipliers)
+
 def calculate_r_multiples(stop_loss_amount, r_multiples=[1, 2, 2.5, 3]):
     """Calculate R multiple targets based on stop loss amount"""
     if not stop_loss_amount or stop_loss_amount == "N/A":
         return None
     
-    r_targets = {}
-    for r in r_multiples:
-        r_targets[f"{r}R"] = stop_loss_amount * r
-    
-    return r_targets
+    targets = np.asarray(r_multiples, dtype='f8') * stop_loss_amount
+    return {f"{r}R": float(target) for r, target in zip(r_multiples, targets)}
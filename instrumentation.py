@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+# Set to a file path to also write every span and fetch event there as JSON lines
+TIMING_LOG_ENV = "FUTURES_TIMING_LOG"
+MAX_RECENT_SPANS = 500
+
+logger = logging.getLogger("futures_calculator.timing")
+
+_lock = threading.Lock()
+_local = threading.local()
+_recent_spans = deque(maxlen=MAX_RECENT_SPANS)
+_stage_totals = {}
+_symbol_counters = {}
+
+if os.environ.get(TIMING_LOG_ENV):
+    _handler = logging.FileHandler(os.environ[TIMING_LOG_ENV])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+def _log(event):
+    """Emit one structured log record"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(event, default=str))
+
+@contextmanager
+def span(stage, **fields):
+    """Time a pipeline stage such as 'fetch', 'atr', 'enrichment', 'formatting' or 'render'
+
+    Extra keyword fields are attached to the span record. Spans opened
+    inside another span on the same thread record it as their parent.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    stack.append(stage)
+
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        record = {
+            'event': 'span',
+            'stage': stage,
+            'parent': parent,
+            'duration_ms': duration * 1000,
+            'started_at': time.time() - duration,
+            'thread': threading.current_thread().name,
+            **fields
+        }
+        if error:
+            record['error'] = error
+
+        with _lock:
+            _recent_spans.append(record)
+            totals = _stage_totals.setdefault(stage, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0})
+            totals['count'] += 1
+            totals['total_ms'] += record['duration_ms']
+            totals['max_ms'] = max(totals['max_ms'], record['duration_ms'])
+            totals['last_ms'] = record['duration_ms']
+        _log(record)
+
+def timed(stage):
+    """Decorator that wraps every call of a function in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, function=func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _counters(symbol):
+    """Return the counters for a symbol, creating them if needed; call with _lock held"""
+    counters = _symbol_counters.get(symbol)
+    if counters is None:
+        counters = _symbol_counters[symbol] = {
+            'requests': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'retries': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'total_latency_ms': 0.0,
+            'last_latency_ms': None
+        }
+    return counters
+
+def record_fetch(symbol, latency, ok, retries=0):
+    """Count one upstream fetch for a symbol with its latency in seconds"""
+    with _lock:
+        counters = _counters(symbol)
+        counters['requests'] += 1
+        counters['retries'] += retries
+        if not ok:
+            counters['failures'] += 1
+        counters['total_latency_ms'] += latency * 1000
+        counters['last_latency_ms'] = latency * 1000
+    _log({'event': 'fetch', 'symbol': symbol, 'latency_ms': latency * 1000, 'ok': ok, 'retries': retries})
+
+def record_timeout(symbol):
+    """Count a fetch that was abandoned because it ran past its timeout or the deadline"""
+    with _lock:
+        _counters(symbol)['timeouts'] += 1
+    _log({'event': 'timeout', 'symbol': symbol})
+
+def record_retry(symbol):
+    """Count a retried upstream request for a symbol"""
+    with _lock:
+        _counters(symbol)['retries'] += 1
+
+def record_cache(symbol, hit):
+    """Count a market data cache lookup for a symbol"""
+    with _lock:
+        counters = _counters(symbol)
+        counters['cache_hits' if hit else 'cache_misses'] += 1
+
+def get_stage_summary():
+    """Return per-stage timing totals as a list of dicts"""
+    with _lock:
+        return [
+            {'stage': stage, 'mean_ms': totals['total_ms'] / totals['count'], **totals}
+            for stage, totals in _stage_totals.items()
+        ]
+
+def get_symbol_counters():
+    """Return per-symbol fetch counters as a list of dicts"""
+    with _lock:
+        summary = []
+        for symbol, counters in _symbol_counters.items():
+            mean = counters['total_latency_ms'] / counters['requests'] if counters['requests'] else None
+            summary.append({'symbol': symbol, 'mean_latency_ms': mean, **counters})
+        return summary
+
+def get_recent_spans(limit=50):
+    """Return the most recent span records, newest last"""
+    with _lock:
+        return list(_recent_spans)[-limit:]
+
+def reset():
+    """Clear all recorded spans and counters"""
+    with _lock:
+        _recent_spans.clear()
+        _stage_totals.clear()
+        _symbol_counters.clear()
@@ -0,0 +1,94 @@
+import numpy as np
+
+# Simulation defaults for the calculator page
+DEFAULT_PATHS = 20000
+DEFAULT_TRADES = 100
+DEFAULT_CHUNK_ELEMENTS = 1_000_000  # paths x trades values generated per chunk, which bounds memory
+MAX_SIMULATED_TRADES = 10_000_000  # paths x trades the calculator page runs interactively
+RUIN_DRAWDOWN = 0.5  # an account that loses this fraction of its starting equity counts as ruined
+PERCENTILES = (5, 25, 50, 75, 95)
+SAMPLE_PATHS = 50  # equity curves kept for plotting
+
+def expectancy_r(win_rate, payoff_r):
+    """Return the expected result of one trade in R"""
+    return win_rate * payoff_r - (1 - win_rate)
+
+def simulate_equity_chunk(rng, paths, trades, account_size, risk_per_trade, win_rate, payoff_r, ruin_level):
+    """Simulate a chunk of trade sequences and return (equity, ruined)
+
+    equity has shape (paths, trades + 1) and starts at account_size. Every
+    trade wins payoff_r * risk_per_trade or loses risk_per_trade. A path
+    stops trading once its equity reaches ruin_level, so the rest of its
+    curve stays at that value.
+    """
+    wins = rng.random((paths, trades), dtype=np.float32) < win_rate
+    pnl = np.where(wins, payoff_r * risk_per_trade, -risk_per_trade)
+
+    equity = np.empty((paths, trades + 1))
+    equity[:, 0] = account_size
+    np.cumsum(pnl, axis=1, out=equity[:, 1:])
+    equity[:, 1:] += account_size
+
+    below = equity <= ruin_level
+    ruined = below.any(axis=1)
+    if ruined.any():
+        first = below.argmax(axis=1)
+        after_ruin = np.arange(trades + 1) >= first[:, None]
+        frozen = equity[np.arange(paths), first][:, None]
+        equity = np.where(ruined[:, None] & after_ruin, frozen, equity)
+    return equity, ruined
+
+def max_drawdowns(equity):
+    """Return the largest peak-to-trough drawdown of each equity curve as a fraction of the peak"""
+    peaks = np.maximum.accumulate(equity, axis=1)
+    return ((peaks - equity) / peaks).max(axis=1)
+
+def simulate_risk_of_ruin(account_size, risk_per_trade, win_rate, payoff_r, trades=DEFAULT_TRADES,
+                          paths=DEFAULT_PATHS, ruin_drawdown=RUIN_DRAWDOWN, chunk_elements=DEFAULT_CHUNK_ELEMENTS,
+                          seed=None):
+    """Run a Monte Carlo simulation of fixed-risk trade sequences
+
+    risk_per_trade is the dollar loss of a losing trade, e.g. contracts
+    times the ATR-based stop loss amount. Paths are generated in chunks of
+    about chunk_elements trades, so memory stays bounded however many paths
+    and trades are requested. Returns
+    a dict with:
+      - risk_of_ruin: fraction of paths that lost ruin_drawdown of the account
+      - terminal_equity, max_drawdown: one value per path
+      - terminal_percentiles, drawdown_percentiles: PERCENTILES of those
+      - sample_paths: the first SAMPLE_PATHS equity curves
+      - expectancy_r: expected result of one trade in R
+
+    Raises ValueError unless paths and trades are at least 1.
+    """
+    if paths < 1 or trades < 1:
+        raise ValueError(f"Need at least one path and one trade, got {paths} paths of {trades} trades")
+
+    rng = np.random.default_rng(seed)
+    ruin_level = account_size * (1 - ruin_drawdown)
+    terminal_equity = np.empty(paths)
+    max_drawdown = np.empty(paths)
+    ruined = np.empty(paths, dtype=bool)
+    sample_paths = None
+    chunk_size = max(1, chunk_elements // (trades + 1))
+
+    for start in range(0, paths, chunk_size):
+        stop = min(start + chunk_size, paths)
+        equity, chunk_ruined = simulate_equity_chunk(
+            rng, stop - start, trades, account_size, risk_per_trade, win_rate, payoff_r, ruin_level
+        )
+        terminal_equity[start:stop] = equity[:, -1]
+        max_drawdown[start:stop] = max_drawdowns(equity)
+        ruined[start:stop] = chunk_ruined
+        if sample_paths is None:
+            sample_paths = equity[:SAMPLE_PATHS].copy()
+
+    return {
+        'risk_of_ruin': float(ruined.mean()),
+        'terminal_equity': terminal_equity,
+        'max_drawdown': max_drawdown,
+        'terminal_percentiles': dict(zip(PERCENTILES, np.percentile(terminal_equity, PERCENTILES))),
+        'drawdown_percentiles': dict(zip(PERCENTILES, np.percentile(max_drawdown, PERCENTILES))),
+        'sample_paths': sample_paths,
+        'expectancy_r': expectancy_r(win_rate, payoff_r)
+    }
@@ -0,0 +1,208 @@
+import math
+import numpy as np
+import pandas as pd
+
+from correlation import get_correlations
+from futures_data import CONTRACTS_BY_SYMBOL, get_market_snapshot
+
+INITIAL_CAPACITY = 16  # legs allocated up front; doubled whenever the book outgrows it
+
+class Portfolio:
+    """A book of futures positions with risk totals maintained incrementally
+
+    Each leg's risk is its signed ATR dollar risk w = contracts x multiplier
+    x ATR. The correlation-adjusted risk is sqrt(w' C w) for the correlation
+    matrix C of the legs' daily returns. Changing one leg updates C w and
+    w' C w in O(legs) time, and adding a leg copies only its own row of C
+    from the shared rolling correlation cache, so no correlations are
+    recomputed while the book is edited. C is refilled from the cache only
+    when the cache has moved on, e.g. after a new daily bar.
+    """
+
+    def __init__(self, account_size=None, snapshot=None, correlations=None):
+        self.account_size = account_size
+        self.snapshot = snapshot
+        self.correlations = correlations or get_correlations()
+        self._version = self.correlations.version
+        self._matrix = self.correlations.correlation
+        self._slots = {}  # symbol -> row of the leg arrays
+        self._symbols = []
+        self._allocate(INITIAL_CAPACITY)
+        self._variance = 0.0
+        self._totals = dict.fromkeys(('gross_notional', 'net_notional', 'margin', 'atr_risk'), 0.0)
+
+    def _allocate(self, capacity):
+        """Grow the leg arrays to `capacity` rows, keeping the existing legs"""
+        n = len(self._symbols)
+        arrays = {
+            'contracts': np.zeros(capacity),
+            'price': np.zeros(capacity),
+            'atr': np.zeros(capacity),
+            'multiplier': np.zeros(capacity),
+            'margin': np.zeros(capacity),
+            'risk': np.zeros(capacity),  # w
+            'corr_risk': np.zeros(capacity),  # C w
+            'universe': np.zeros(capacity, dtype='i8'),  # row of the leg in the correlation cache
+            'has_price': np.zeros(capacity, dtype=bool),
+            'has_atr': np.zeros(capacity, dtype=bool)
+        }
+        corr = np.zeros((capacity, capacity))
+        if n:
+            for name, values in arrays.items():
+                values[:n] = getattr(self, f'_{name}')[:n]
+            corr[:n, :n] = self._corr[:n, :n]
+        for name, values in arrays.items():
+            setattr(self, f'_{name}', values)
+        self._corr = corr
+
+    def _sync_correlations(self):
+        """Refill C from the correlation cache if it has published a newer matrix since"""
+        if self.correlations.version == self._version:
+            return
+        self._version = self.correlations.version
+        self._matrix = self.correlations.correlation
+        n = len(self._symbols)
+        legs = self._universe[:n]
+        self._corr[:n, :n] = self._matrix[np.ix_(legs, legs)]
+        self.recompute()
+
+    def _add_leg(self, symbol):
+        """Add a leg with no contracts, fetching its market data and its row of correlations"""
+        future = CONTRACTS_BY_SYMBOL.get(symbol)
+        if future is None:
+            raise ValueError(f"Unknown contract '{symbol}'")
+
+        snapshot = self.snapshot
+        if snapshot is None or symbol not in snapshot:
+            snapshot = get_market_snapshot([symbol])
+        price = snapshot.price(symbol)
+        atr = snapshot.atr(symbol)
+
+        # A symbol stored for the first time just now is not in the cache yet
+        if not self.correlations.has_data(symbol):
+            self.correlations.update()
+        self._sync_correlations()
+
+        n = len(self._symbols)
+        if n == len(self._risk):
+            self._allocate(2 * n)
+        self._slots[symbol] = n
+        self._symbols.append(symbol)
+        # Missing values count as 0 in the totals and are reported by summary()
+        self._has_price[n] = price is not None and not math.isnan(price)
+        self._has_atr[n] = atr is not None and not math.isnan(atr)
+        self._price[n] = price if self._has_price[n] else 0.0
+        self._atr[n] = atr if self._has_atr[n] else 0.0
+        self._multiplier[n] = future['multiplier']
+        self._margin[n] = future['initial_margin']
+
+        j = self.correlations.index[symbol]
+        self._universe[n] = j
+        row = self._matrix[j, self._universe[:n]].astype('f8')
+        self._corr[n, :n] = row
+        self._corr[:n, n] = row
+        self._corr[n, n] = 1.0
+        # The new leg holds no risk yet, so only its entry of C w needs filling in
+        self._corr_risk[n] = row @ self._risk[:n]
+        return n
+
+    def set_position(self, symbol, contracts):
+        """Set the signed number of contracts held in a symbol, negative for short"""
+        i = self._slots.get(symbol)
+        if i is None:
+            i = self._add_leg(symbol)
+
+        old = self._contracts[i]
+        delta = contracts - old
+        if delta == 0:
+            return
+
+        price, multiplier, margin = self._price[i], self._multiplier[i], self._margin[i]
+        self._totals['gross_notional'] += (abs(contracts) - abs(old)) * price * multiplier
+        self._totals['net_notional'] += delta * price * multiplier
+        self._totals['margin'] += (abs(contracts) - abs(old)) * margin
+        self._totals['atr_risk'] += (abs(contracts) - abs(old)) * self._atr[i] * multiplier
+
+        # w_i changes by d: w'Cw grows by 2 d (Cw)_i + d^2 C_ii and Cw by d C[:, i]
+        n = len(self._symbols)
+        d = delta * multiplier * self._atr[i]
+        self._variance += 2 * d * self._corr_risk[i] + d * d * self._corr[i, i]
+        self._corr_risk[:n] += d * self._corr[:n, i]
+        self._risk[i] += d
+        self._contracts[i] = contracts
+
+    def remove_position(self, symbol):
+        """Close a symbol's position; its leg stays so reopening it needs no new correlations"""
+        if symbol in self._slots:
+            self.set_position(symbol, 0)
+
+    @property
+    def positions(self):
+        """Return symbol -> contracts for every open position"""
+        return {
+            symbol: int(self._contracts[i])
+            for symbol, i in self._slots.items() if self._contracts[i] != 0
+        }
+
+    def recompute(self):
+        """Rebuild C w and w' C w from scratch, clearing any accumulated rounding error"""
+        n = len(self._symbols)
+        self._corr_risk[:n] = self._corr[:n, :n] @ self._risk[:n]
+        self._variance = float(self._risk[:n] @ self._corr_risk[:n])
+
+    def summary(self):
+        """Return the book's totals as a dict
+
+        atr_risk adds up every leg's ATR dollar risk; correlated_risk nets
+        them through the return correlations. Margin usage is a fraction of
+        account_size when one is set. missing_data lists open positions
+        without a price or ATR, whose notional or risk the totals leave out.
+        """
+        correlated_risk = math.sqrt(max(self._variance, 0.0))
+        atr_risk = self._totals['atr_risk']
+        margin_usage = None
+        if self.account_size:
+            margin_usage = self._totals['margin'] / self.account_size
+        return {
+            'positions': len(self.positions),
+            'gross_notional': float(self._totals['gross_notional']),
+            'net_notional': float(self._totals['net_notional']),
+            'margin': float(self._totals['margin']),
+            'margin_usage': margin_usage,
+            'atr_risk': float(atr_risk),
+            'correlated_risk': correlated_risk,
+            'diversification_ratio': atr_risk / correlated_risk if correlated_risk else None,
+            'missing_data': self.missing_data
+        }
+
+    @property
+    def missing_data(self):
+        """Return the symbols of open positions without a price or ATR"""
+        return sorted(
+            symbol for symbol, i in self._slots.items()
+            if self._contracts[i] != 0 and not (self._has_price[i] and self._has_atr[i])
+        )
+
+    def legs_df(self):
+        """Return one row per open position with its notional, margin and risk contribution
+
+        risk_contribution splits correlated_risk across legs: w_i (C w)_i /
+        sqrt(w' C w), which sums to the correlated risk. Values that depend on
+        a missing price or ATR are NaN.
+        """
+        rows = [i for i in self._slots.values() if self._contracts[i] != 0]
+        correlated_risk = math.sqrt(max(self._variance, 0.0))
+        contracts = self._contracts[rows]
+        risk = self._risk[rows]
+        contribution = risk * self._corr_risk[rows] / correlated_risk if correlated_risk else np.zeros(len(rows))
+        price = np.where(self._has_price[rows], self._price[rows], np.nan)
+        has_atr = self._has_atr[rows]
+        return pd.DataFrame({
+            'symbol': [self._symbols[i] for i in rows],
+            'contracts': contracts.astype('i8'),
+            'price': price,
+            'notional': contracts * price * self._multiplier[rows],
+            'margin': np.abs(contracts) * self._margin[rows],
+            'atr_risk': np.where(has_atr, np.abs(risk), np.nan),
+            'risk_contribution': np.where(has_atr, contribution, np.nan)
+        })
@@ -0,0 +1,187 @@
+import os
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+
+# Provider selection; see get_provider()
+PROVIDER_ENV = "FUTURES_DATA_PROVIDER"
+REPLAY_DIR_ENV = "FUTURES_REPLAY_DIR"
+DEFAULT_PROVIDER = "yfinance"
+DEFAULT_REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "bars")
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+class YFinanceProvider:
+    """Daily bars from Yahoo Finance"""
+
+    name = "yfinance"
+    store_name = name  # subdirectory of the bar store holding this provider's bars
+
+    def today(self):
+        """Return the provider's current date"""
+        return datetime.now().date()
+
+    def download_daily_bars(self, symbols, days, timeout=None):
+        """Download the last `days` calendar days of bars for symbols in one request
+
+        Returns a dict of symbol -> DataFrame with Open, High, Low and Close
+        columns. Symbols without any data are left out.
+        """
+        import yfinance as yf
+
+        symbols = list(symbols)
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        data = yf.download(
+            symbols,
+            start=start_date,
+            end=end_date,
+            group_by='ticker',
+            auto_adjust=False,
+            progress=False,
+            **kwargs
+        )
+
+        bars = {}
+        if data is None or data.empty:
+            return bars
+
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+
+            # Rows from other symbols' trading days come back as NaN
+            frame = frame[BAR_COLUMNS].dropna(subset=['Close'])
+            if not frame.empty:
+                bars[symbol] = frame
+        return bars
+
+class ReplayProvider:
+    """Daily bars replayed from CSV files recorded with record_bars()
+
+    Each symbol is a <symbol>.csv file with Date, Open, High, Low and Close
+    columns. The replay clock is fixed at `as_of`, by default the latest
+    recorded date, so the same files always produce the same results.
+    """
+
+    name = "replay"
+
+    def __init__(self, directory=None, as_of=None):
+        self.directory = directory or os.environ.get(REPLAY_DIR_ENV, DEFAULT_REPLAY_DIR)
+        # Each fixture directory gets its own bar store, apart from live data and other recordings
+        directory_key = hashlib.sha1(os.path.abspath(self.directory).encode()).hexdigest()[:12]
+        self.store_name = f"{self.name}-{directory_key}"
+        self._as_of = pd.Timestamp(as_of) if as_of is not None else None
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _load(self, symbol):
+        """Read a symbol's recorded bars once and keep them in memory"""
+        with self._lock:
+            if symbol not in self._frames:
+                path = _fixture_path(self.directory, symbol)
+                frame = None
+                if os.path.exists(path):
+                    frame = pd.read_csv(path, index_col='Date', parse_dates=['Date'])[BAR_COLUMNS]
+                self._frames[symbol] = frame
+            return self._frames[symbol]
+
+    @property
+    def as_of(self):
+        """Date the replay treats as today"""
+        if self._as_of is None:
+            last_dates = []
+            filenames = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+            for filename in filenames:
+                if filename.endswith('.csv'):
+                    frame = self._load(_fixture_symbol(filename))
+                    if frame is not None and not frame.empty:
+                        last_dates.append(frame.index[-1])
+            self._as_of = max(last_dates) if last_dates else pd.Timestamp.now().normalize()
+        return self._as_of
+
+    def today(self):
+        """Return the provider's current date, which is the replay's as_of date"""
+        return self.as_of.date()
+
+    def download_daily_bars(self, symbols, days, timeout=None):
+        """Return the recorded bars of symbols for the `days` calendar days up to as_of"""
+        end_date = self.as_of
+        start_date = end_date - pd.Timedelta(days=days)
+        bars = {}
+        for symbol in symbols:
+            frame = self._load(symbol)
+            if frame is None:
+                continue
+            frame = frame.loc[start_date:end_date]
+            if not frame.empty:
+                bars[symbol] = frame
+        return bars
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    ReplayProvider.name: ReplayProvider
+}
+
+_provider = None
+
+def _fixture_path(directory, symbol):
+    """Return the CSV file path for a symbol's recorded bars"""
+    return os.path.join(directory, symbol.replace('=', '_').replace('/', '_') + '.csv')
+
+def _fixture_symbol(filename):
+    """Recover the symbol from a recorded CSV filename"""
+    return filename[:-len('.csv')].replace('_', '=')
+
+def get_provider():
+    """Return the configured market data provider
+
+    Chosen by set_provider() or else the FUTURES_DATA_PROVIDER environment
+    variable ('yfinance' or 'replay').
+    """
+    global _provider
+    if _provider is None:
+        name = os.environ.get(PROVIDER_ENV, DEFAULT_PROVIDER)
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown market data provider '{name}', expected one of {sorted(PROVIDERS)}")
+        _provider = PROVIDERS[name]()
+    return _provider
+
+def set_provider(provider):
+    """Use a specific provider instance for all market data requests"""
+    global _provider
+    _provider = provider
+
+def record_bars(bars, directory):
+    """Write symbol -> DataFrame bars as CSV files that ReplayProvider can read"""
+    os.makedirs(directory, exist_ok=True)
+    for symbol, frame in bars.items():
+        frame = frame[BAR_COLUMNS].copy()
+        frame.index = pd.DatetimeIndex(frame.index).tz_localize(None).rename('Date')
+        frame.to_csv(_fixture_path(directory, symbol))
+
+def main():
+    """Record live bars for every contract so they can be replayed offline"""
+    from futures_data import CONTRACTS_BY_SYMBOL
+
+    parser = argparse.ArgumentParser(description="Record daily bars for offline replay")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_REPLAY_DIR, help="Where to write the CSV files")
+    parser.add_argument("--days", type=int, default=365, help="Calendar days of history to record")
+    args = parser.parse_args()
+
+    bars = YFinanceProvider().download_daily_bars(list(CONTRACTS_BY_SYMBOL), args.days)
+    record_bars(bars, args.directory)
+    print(f"Recorded {len(bars)} symbols to {args.directory}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from instrumentation import span
+from bar_store import atomic_write
+from providers import get_provider
+from futures_data import MarketSnapshot, refresh_market_snapshot, PRICE_TTL
+
+# File the latest market snapshot is published to. Unless it is set, each
+# market data provider in use gets its own file, see snapshot_file()
+SNAPSHOT_FILE = os.environ.get("FUTURES_SNAPSHOT_FILE")
+SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".futurecalculator")
+
+# How the app gets its snapshot: 'thread' runs the refresher inside the
+# Streamlit server, 'process' expects `python refresher.py` to be running
+# separately and 'off' makes every page fetch its own market data
+REFRESHER_MODE = os.environ.get("FUTURES_REFRESHER", "thread")
+
+REFRESH_INTERVAL = PRICE_TTL  # seconds between refreshes
+MAX_SNAPSHOT_AGE = 5 * REFRESH_INTERVAL  # older snapshots are ignored by readers
+
+_read_lock = threading.Lock()
+_last_read = (None, None)  # ((path, mtime_ns, size), (snapshot, published_at, provider))
+
+def snapshot_file():
+    """Return the snapshot file of the market data provider currently in use"""
+    return SNAPSHOT_FILE or os.path.join(SNAPSHOT_DIR, f"snapshot-{get_provider().store_name}.json")
+
+def publish_snapshot(snapshot, path=None):
+    """Write a snapshot to the shared file, replacing it atomically"""
+    path = path or snapshot_file()
+    record = {
+        'provider': get_provider().store_name,
+        'as_of': snapshot.as_of.isoformat(),
+        'published_at': time.time(),
+        'prices': snapshot.prices,
+        'atrs': snapshot.atrs
+    }
+    atomic_write(path, lambda f: json.dump(record, f, default=float), mode='w')
+
+def read_snapshot(path=None, max_age=MAX_SNAPSHOT_AGE):
+    """Return the latest published snapshot, or None if there is none younger than max_age seconds
+
+    Snapshots published from another market data provider are ignored. The
+    file is only parsed again when it has changed since the last read.
+    """
+    global _last_read
+    path = path or snapshot_file()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _read_lock:
+        if _last_read[0] == key:
+            snapshot, published_at, provider = _last_read[1]
+        else:
+            try:
+                with open(path) as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading market snapshot {path}: {e}")
+                return None
+            snapshot = MarketSnapshot(record['prices'], record['atrs'], datetime.fromisoformat(record['as_of']))
+            published_at = record['published_at']
+            provider = record.get('provider')
+            _last_read = (key, (snapshot, published_at, provider))
+
+    if provider != get_provider().store_name:
+        return None
+    if max_age is not None and time.time() - published_at > max_age:
+        return None
+    return snapshot
+
+class Refresher:
+    """Refreshes market data for all contracts on a schedule and publishes the snapshot"""
+
+    def __init__(self, interval=REFRESH_INTERVAL, path=None, symbols=None):
+        self.interval = interval
+        self.path = path
+        self.symbols = symbols
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_once(self):
+        """Fetch a new snapshot and publish it"""
+        with span('refresh'):
+            snapshot = refresh_market_snapshot(self.symbols)
+            publish_snapshot(snapshot, self.path)
+        return snapshot
+
+    def run(self):
+        """Refresh every `interval` seconds until stop() is called"""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.refresh_once()
+            except Exception as e:
+                print(f"Error refreshing market snapshot: {e}")
+            self._stop.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """Run the refresher on a daemon thread if it is not running already"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="market-data-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the refresher thread and wait for it to finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def start_refresher(interval=REFRESH_INTERVAL):
+    """Start the process-wide refresher thread once and return it"""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = Refresher(interval)
+        return _refresher.start()
+
+def get_shared_snapshot():
+    """Return the latest published snapshot for the app, or None to fetch on demand
+
+    Starts the in-server refresher first when REFRESHER_MODE is 'thread'.
+    """
+    if REFRESHER_MODE == 'off':
+        return None
+    if REFRESHER_MODE == 'thread':
+        start_refresher()
+    return read_snapshot()
+
+def main():
+    """Run the refresher as a standalone process"""
+    parser = argparse.ArgumentParser(description="Refresh market data on a schedule and publish the snapshot")
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="Seconds between refreshes")
+    parser.add_argument("--output", help="Snapshot file to publish to; defaults to the provider's snapshot file")
+    parser.add_argument("--once", action="store_true", help="Refresh and publish once, then exit")
+    args = parser.parse_args()
+    args.output = args.output or snapshot_file()
+
+    refresher = Refresher(args.interval, args.output)
+    if args.once:
+        snapshot = refresher.refresh_once()
+        print(f"Published {len(snapshot.prices)} symbols to {args.output}")
+        return
+
+    print(f"Publishing market snapshots to {args.output} every {args.interval:g} seconds")
+    try:
+        refresher.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
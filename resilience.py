@@ -0,0 +1,146 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while a circuit breaker is open"""
+
+class UpstreamTimeoutError(Exception):
+    """Raised when an upstream call runs past its timeout"""
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures until a cool-down has passed
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() refuses calls. Once `reset_timeout` seconds have passed it lets
+    a single trial call through; success closes it again, failure re-opens it.
+    A trial that never reports back is replaced after another reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return whether a call may go upstream now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            # Cooling down, or a trial call is in flight
+            return False
+
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """Count a failed call, opening the breaker if there were too many in a row"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def summary(self):
+        """Return the breaker's state and failure counts as a dict"""
+        with self._lock:
+            retry_in = None
+            if self.state != CLOSED:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'breaker': self.name,
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'retry_in_s': retry_in
+            }
+
+class BreakerRegistry:
+    """Circuit breakers created on first use, one per name"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the breaker for a name such as 'provider:yfinance' or 'symbol:ES=F'"""
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def summary(self):
+        """Return every breaker's summary, open ones first"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return sorted((breaker.summary() for breaker in breakers), key=lambda s: (s['state'] == CLOSED, s['breaker']))
+
+    def reset(self):
+        """Forget all breakers, closing every circuit"""
+        with self._lock:
+            self._breakers.clear()
+
+_call_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="upstream-call")
+
+def call_with_timeout(func, timeout, *args, **kwargs):
+    """Call func on a worker thread and give up after timeout seconds
+
+    A call that times out keeps running in the background; its result is
+    discarded.
+    """
+    future = _call_executor.submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise UpstreamTimeoutError(f"Upstream call took longer than {timeout:.1f}s")
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=4.0):
+    """Return a full-jitter exponential backoff delay for a zero-based retry attempt"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def retry_call(func, attempts=3, timeout=None, base_delay=0.5, max_delay=4.0, on_retry=None):
+    """Call func() until it succeeds, sleeping a jittered backoff between attempts
+
+    timeout bounds all attempts together: each attempt gets the time that
+    is left, and no retry starts once it has run out. on_retry(attempt,
+    error) is called before each retry. The last error is re-raised.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for attempt in range(attempts):
+        try:
+            if deadline is None:
+                return func()
+            return call_with_timeout(func, max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            if on_retry:
+                on_retry(attempt + 1, e)
+            time.sleep(delay)
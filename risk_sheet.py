@@ -0,0 +1,188 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+from futures_data import (
+    CONTRACT_COLUMNS,
+    ATR_MULTIPLIERS,
+    R_MULTIPLES,
+    LONG,
+    SHORT,
+    get_market_snapshot,
+    stop_target_grid_df,
+    calculate_risk_amount,
+    calculate_position_sizes
+)
+
+FORMATS = ('csv', 'parquet', 'json')
+DIRECTIONS = {'long': (LONG,), 'short': (SHORT,), 'both': (LONG, SHORT)}
+
+def select_contracts(names=None, sections=None):
+    """Return the registry rows of contracts matching symbols or tickers and sections, all by default
+
+    Raises ValueError for names or sections that match no contract.
+    """
+    rows = np.ones(len(CONTRACT_COLUMNS['symbol']), dtype=bool)
+    if names:
+        by_name = np.isin(CONTRACT_COLUMNS['symbol'], names) | np.isin(CONTRACT_COLUMNS['ticker'], names)
+        unknown = set(names) - set(CONTRACT_COLUMNS['symbol']) - set(CONTRACT_COLUMNS['ticker'])
+        if unknown:
+            raise ValueError(f"Unknown contracts: {', '.join(sorted(unknown))}")
+        rows &= by_name
+    if sections:
+        unknown = set(sections) - set(CONTRACT_COLUMNS['section'])
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+        rows &= np.isin(CONTRACT_COLUMNS['section'], sections)
+    return np.flatnonzero(rows)
+
+def build_grid(rows, snapshot, atr_multipliers=ATR_MULTIPLIERS, r_multiples=R_MULTIPLES, directions=(LONG, SHORT)):
+    """Return the stop/target grid for the contracts at registry rows, with their details
+
+    Contracts without a price or ATR in the snapshot are left out.
+    """
+    symbols = CONTRACT_COLUMNS['symbol'][rows]
+    prices, atrs = snapshot.arrays(symbols)
+    has_data = ~(np.isnan(prices) | np.isnan(atrs))
+    missing = symbols[~has_data]
+    if len(missing):
+        print(f"No market data for {', '.join(missing)}; leaving them out", file=sys.stderr)
+    rows, symbols, prices, atrs = rows[has_data], symbols[has_data], prices[has_data], atrs[has_data]
+
+    grid = stop_target_grid_df(
+        symbols, prices, atrs, CONTRACT_COLUMNS['multiplier'][rows], atr_multipliers, r_multiples, directions
+    )
+    # Every contract has the same number of grid rows, in registry order
+    per_contract = len(grid) // len(symbols) if len(symbols) else 0
+    details = {
+        'ticker': CONTRACT_COLUMNS['ticker'][rows],
+        'name': CONTRACT_COLUMNS['name'][rows],
+        'section': CONTRACT_COLUMNS['section'][rows],
+        'price': prices,
+        'atr': atrs
+    }
+    for position, (column, values) in enumerate(details.items(), start=1):
+        grid.insert(position, column, np.repeat(values, per_contract))
+    return grid
+
+def risk_sheet(grid, account, account_size, risk_percentage):
+    """Size every grid row for one account and return the sheet
+
+    Contracts are the most whose stop loss fits in the account's risk amount.
+    """
+    risk_amount = float(calculate_risk_amount(account_size, risk_percentage))
+    contracts = calculate_position_sizes(risk_amount, grid['stop_loss_amount'].to_numpy())
+    sheet = grid.assign(
+        contracts=contracts,
+        total_risk=contracts * grid['stop_loss_amount'].to_numpy(),
+        total_target=contracts * grid['target_amount'].to_numpy()
+    )
+    sheet.insert(0, 'account', account)
+    sheet.insert(1, 'account_size', float(account_size))
+    sheet.insert(2, 'risk_percentage', float(risk_percentage))
+    sheet.insert(3, 'risk_amount', risk_amount)
+    return sheet
+
+def read_accounts(path, default_risk_percentage):
+    """Read (account, account_size, risk_percentage) rows from a CSV file
+
+    The file needs account and account_size columns; risk_percentage is
+    optional and defaults to default_risk_percentage.
+    """
+    accounts = pd.read_csv(path)
+    if 'risk_percentage' not in accounts:
+        accounts['risk_percentage'] = default_risk_percentage
+    accounts['risk_percentage'] = accounts['risk_percentage'].fillna(default_risk_percentage)
+    return list(accounts[['account', 'account_size', 'risk_percentage']].itertuples(index=False, name=None))
+
+def write_sheets(sheets, output, fmt):
+    """Write sheets one at a time as CSV, Parquet or JSON lines; '-' writes to stdout
+
+    Only one account's sheet is held in memory at a time. Returns the
+    number of rows written.
+    """
+    rows = 0
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for sheet in sheets:
+                table = pa.Table.from_pandas(sheet, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, table.schema)
+                writer.write_table(table)
+                rows += len(sheet)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    f = sys.stdout if output == '-' else open(output, 'w', newline='')
+    try:
+        for i, sheet in enumerate(sheets):
+            if fmt == 'csv':
+                sheet.to_csv(f, header=i == 0, index=False)
+            else:
+                f.write(sheet.to_json(orient='records', lines=True).rstrip('\n') + '\n')
+            rows += len(sheet)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return rows
+
+def resolve_format(parser, output, fmt=None):
+    """Return the output format, from the output file's extension unless given; exits on parquet to stdout"""
+    if fmt is None:
+        extension = os.path.splitext(output)[1].lstrip('.').lower()
+        fmt = extension if extension in FORMATS else 'csv'
+    if fmt == 'parquet' and output == '-':
+        parser.error("Parquet output needs a file; pass --output")
+    return fmt
+
+def parse_contracts(parser, symbols=None, sections=None):
+    """Return select_contracts() for command-line arguments, exiting with a usage error if nothing matches"""
+    try:
+        return select_contracts(symbols, sections)
+    except ValueError as e:
+        parser.error(str(e))
+
+def main():
+    """Write position sizes, stops and targets for every contract and account"""
+    parser = argparse.ArgumentParser(description="Write a risk sheet of position sizes, stops and targets")
+    accounts = parser.add_mutually_exclusive_group(required=True)
+    accounts.add_argument("--account-size", type=float, nargs="+", help="One or more account sizes in dollars")
+    accounts.add_argument("--accounts", help="CSV file with account, account_size and optional risk_percentage columns")
+    parser.add_argument("--risk-pct", type=float, default=1.0, help="Percent of the account risked per trade")
+    parser.add_argument("--atr-multipliers", type=float, nargs="+", default=list(ATR_MULTIPLIERS),
+                        help="ATR multiples for the stop distance")
+    parser.add_argument("--r-multiples", type=float, nargs="+", default=list(R_MULTIPLES),
+                        help="Reward-to-risk multiples for the targets")
+    parser.add_argument("--direction", choices=sorted(DIRECTIONS), default="both")
+    parser.add_argument("--symbols", nargs="+", help="Only these contracts, as symbols (ES=F) or tickers (/ES)")
+    parser.add_argument("--sections", nargs="+", help="Only contracts in these sections, e.g. Equity Metals")
+    parser.add_argument("--output", default="-", help="Output file, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="Output format; defaults to the output file's extension, else csv")
+    args = parser.parse_args()
+
+    fmt = resolve_format(parser, args.output, args.format)
+    rows = parse_contracts(parser, args.symbols, args.sections)
+
+    if args.accounts:
+        account_list = read_accounts(args.accounts, args.risk_pct)
+    else:
+        account_list = [(f"account_{i + 1}", size, args.risk_pct) for i, size in enumerate(args.account_size)]
+
+    snapshot = get_market_snapshot(CONTRACT_COLUMNS['symbol'][rows])
+    grid = build_grid(rows, snapshot, args.atr_multipliers, args.r_multiples, DIRECTIONS[args.direction])
+    sheets = (risk_sheet(grid, *account) for account in account_list)
+    written = write_sheets(sheets, args.output, fmt)
+    if args.output != '-':
+        print(f"Wrote {written} rows for {len(account_list)} accounts to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
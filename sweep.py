@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import argparse
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from atr import stack_bars
+from backtest import backtest_stop_targets, backtest_grid_df, MAX_HOLD_DAYS
+from risk_sheet import resolve_format, parse_contracts, write_sheets, FORMATS
+from futures_data import CONTRACT_COLUMNS, R_MULTIPLES, LONG, SHORT, update_bar_store
+
+DEFAULT_PERIODS = (5, 7, 10, 14, 20, 30)
+DEFAULT_ATR_MULTIPLIERS = (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0)
+MIN_ENTRIES = 30  # configurations backtested on fewer entries are left out of the ranking
+RANK_COLUMNS = ('expectancy_r', 'target_rate')
+
+# Set in each worker by _init_worker
+_worker = {}
+
+def _attach(name):
+    """Attach to an existing shared memory block without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 there is no track flag; pool workers share the
+        # parent's resource tracker, so the parent's unlink still cleans up
+        return shared_memory.SharedMemory(name=name)
+
+def _init_worker(name, shape, settings):
+    """Map the shared bar arrays into this worker and keep the sweep settings"""
+    shm = _attach(name)
+    _worker['shm'] = shm
+    _worker['bars'] = np.ndarray(shape, dtype='f8', buffer=shm.buf)
+    _worker['settings'] = settings
+
+def _run_task(task):
+    """Backtest one contract row of the shared bars with one ATR period"""
+    row, period = task
+    high, low, close = _worker['bars'][:, row]
+    settings = _worker['settings']
+    # Histories are right-aligned; skip the NaN padding in front of short ones
+    start = int(np.argmax(~np.isnan(close)))
+    result = backtest_stop_targets(
+        high[start:], low[start:], close[start:], period,
+        settings['atr_multipliers'], settings['r_multiples'], settings['directions'],
+        settings['horizon'], settings['method']
+    )
+    return row, period, result
+
+def load_bar_arrays(symbols, days=None):
+    """Return stored bars for symbols as one (3, symbols, days) float array, downloading any that are missing
+
+    Symbols without stored bars are left out; the returned list holds the
+    symbols that match the array's rows.
+    """
+    bars = update_bar_store(symbols)
+    stored = [symbol for symbol in symbols if symbol in bars]
+    return stored, np.stack(stack_bars([bars[symbol] for symbol in stored], days))
+
+def sweep(symbols, periods=DEFAULT_PERIODS, atr_multipliers=DEFAULT_ATR_MULTIPLIERS, r_multiples=R_MULTIPLES,
+          directions=(LONG, SHORT), horizon=MAX_HOLD_DAYS, method='sma', workers=None, days=None):
+    """Backtest every ATR period x multiplier x R-multiple x direction for every symbol
+
+    The bars are copied once into shared memory and every worker process
+    maps them, so only (row, period) pairs and results cross process
+    boundaries. workers=1 runs in this process. Returns a tidy DataFrame
+    with one row per symbol and configuration.
+    """
+    symbols, bars = load_bar_arrays(list(symbols), days)
+    settings = {
+        'atr_multipliers': tuple(atr_multipliers),
+        'r_multiples': tuple(r_multiples),
+        'directions': tuple(directions),
+        'horizon': horizon,
+        'method': method
+    }
+    tasks = [(row, period) for row in range(len(symbols)) for period in periods]
+    workers = workers or os.cpu_count() or 1
+
+    shm = shared_memory.SharedMemory(create=True, size=max(bars.nbytes, 1))
+    try:
+        np.ndarray(bars.shape, dtype=bars.dtype, buffer=shm.buf)[:] = bars
+        if workers == 1:
+            _worker.update(bars=bars, settings=settings)
+            try:
+                results = [_run_task(task) for task in tasks]
+            finally:
+                _worker.clear()
+        else:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(shm.name, bars.shape, settings)) as executor:
+                results = list(executor.map(_run_task, tasks, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    frames = []
+    for row, period, result in results:
+        if result is None:
+            continue
+        frame = backtest_grid_df(result, atr_multipliers, r_multiples, directions)
+        frame.insert(0, 'symbol', symbols[row])
+        frame.insert(1, 'atr_period', period)
+        frame['entries'] = result['entries']
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def rank_configurations(results, rank_by='expectancy_r', min_entries=MIN_ENTRIES, best_per_symbol=False):
+    """Sort sweep results best first and number them, optionally keeping each symbol's best"""
+    ranked = results[results['entries'] >= min_entries]
+    ranked = ranked.sort_values([rank_by, 'entries'], ascending=False, kind='stable')
+    if best_per_symbol:
+        ranked = ranked.drop_duplicates('symbol')
+    ranked = ranked.reset_index(drop=True)
+    ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+    return ranked
+
+def main():
+    """Run a parameter sweep and write the ranked configurations"""
+    parser = argparse.ArgumentParser(description="Backtest ATR stop and R-multiple target settings across contracts")
+    parser.add_argument("--periods", type=int, nargs="+", default=list(DEFAULT_PERIODS), help="ATR periods")
+    parser.add_argument("--atr-multipliers", type=float, nargs="+", default=list(DEFAULT_ATR_MULTIPLIERS),
+                        help="ATR multiples for the stop distance")
+    parser.add_argument("--r-multiples", type=float, nargs="+", default=list(R_MULTIPLES),
+                        help="Reward-to-risk multiples for the targets")
+    parser.add_argument("--horizon", type=int, default=MAX_HOLD_DAYS, help="Maximum days a trade is held")
+    parser.add_argument("--method", default="sma", choices=("sma", "wilder", "ema"), help="ATR smoothing")
+    parser.add_argument("--symbols", nargs="+", help="Only these contracts, as symbols (ES=F) or tickers (/ES)")
+    parser.add_argument("--sections", nargs="+", help="Only contracts in these sections, e.g. Equity Metals")
+    parser.add_argument("--workers", type=int, help="Worker processes; defaults to the number of CPUs")
+    parser.add_argument("--rank-by", choices=RANK_COLUMNS, default="expectancy_r")
+    parser.add_argument("--min-entries", type=int, default=MIN_ENTRIES,
+                        help="Leave out configurations backtested on fewer entries")
+    parser.add_argument("--best-per-symbol", action="store_true", help="Keep only each contract's best configuration")
+    parser.add_argument("--output", default="-", help="Output file, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="Output format; defaults to the output file's extension, else csv")
+    args = parser.parse_args()
+
+    fmt = resolve_format(parser, args.output, args.format)
+    rows = parse_contracts(parser, args.symbols, args.sections)
+
+    start = time.perf_counter()
+    results = sweep(
+        CONTRACT_COLUMNS['symbol'][rows], args.periods, args.atr_multipliers, args.r_multiples,
+        horizon=args.horizon, method=args.method, workers=args.workers
+    )
+    if results.empty:
+        print("No contracts had enough stored history to backtest", file=sys.stderr)
+        sys.exit(1)
+    ranked = rank_configurations(results, args.rank_by, args.min_entries, args.best_per_symbol)
+    write_sheets([ranked], args.output, fmt)
+    print(f"Swept {len(results)} configurations in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atr import compute_atr, StreamingATR, ATR_METHODS
+
+PERIOD = 14
+DAYS = 300
+
+def make_bars(days=DAYS, seed=0):
+    """Return random-walk daily bars as a DataFrame"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+    spread = close * rng.uniform(0.002, 0.02, days)
+    return pd.DataFrame(
+        {'High': close + spread / 2, 'Low': close - spread / 2, 'Close': close},
+        index=pd.bdate_range(end="2024-12-31", periods=days)
+    )
+
+def batch_atr(bars, method):
+    """Return compute_atr over a DataFrame's bars"""
+    return compute_atr(bars['High'].to_numpy(), bars['Low'].to_numpy(), bars['Close'].to_numpy(), PERIOD, method)
+
+def assert_same(streamed, expected):
+    """Check a streamed ATR, None before warm-up, against a batch value, NaN before warm-up"""
+    if np.isnan(expected):
+        assert streamed is None
+    else:
+        assert streamed == pytest.approx(expected, rel=1e-12)
+
+@pytest.mark.parametrize("method", ATR_METHODS)
+def test_streaming_matches_batch(method):
+    bars = make_bars()
+    expected = batch_atr(bars, method)
+    streaming = StreamingATR(PERIOD, method)
+    for i, (date, row) in enumerate(bars.iterrows()):
+        assert_same(streaming.update("ES=F", date, row['High'], row['Low'], row['Close']), expected[i])
+    assert_same(streaming.get("ES=F"), expected[-1])
+
+@pytest.mark.parametrize("method", ATR_METHODS)
+def test_revised_partial_bar(method):
+    bars = make_bars()
+    streaming = StreamingATR(PERIOD, method)
+    for i, (date, row) in enumerate(bars.iterrows()):
+        # Every 7th bar is revised, which includes the bars where the window is re-summed
+        if i % 7 == 6:
+            # A partial session first, then the final bar for the same date
+            partial = bars.iloc[:i + 1].copy()
+            partial.iloc[-1] = [row['Close'] * 1.03, row['Close'] * 0.96, row['Close'] * 0.98]
+            value = streaming.update("ES=F", date, *partial.iloc[-1])
+            assert_same(value, batch_atr(partial, method)[-1])
+        value = streaming.update("ES=F", date, row['High'], row['Low'], row['Close'])
+        assert_same(value, batch_atr(bars.iloc[:i + 1], method)[-1])
+
+def test_older_bars_are_ignored():
+    bars = make_bars()
+    streaming = StreamingATR(PERIOD)
+    streaming.update_from_bars("ES=F", bars)
+    value = streaming.get("ES=F")
+    row = bars.iloc[-5]
+    assert streaming.update("ES=F", bars.index[-5], row['High'] * 2, row['Low'], row['Close']) == value
+    assert streaming.last_date("ES=F") == bars.index[-1]
+
+def test_update_from_overlapping_frames():
+    bars = make_bars()
+    streaming = StreamingATR(PERIOD, 'wilder')
+    streaming.update_from_bars("ES=F", bars.iloc[:200])
+    # The next download starts again at the last stored date
+    streaming.update_from_bars("ES=F", bars.iloc[199:])
+    assert_same(streaming.get("ES=F"), batch_atr(bars, 'wilder')[-1])
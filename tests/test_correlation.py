@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_store
+from correlation import RollingCorrelation
+
+SYMBOLS = ["ES=F", "NQ=F", "GC=F", "CL=F"]
+WINDOW = 50
+DAYS = 80
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Point the bar store at an empty temporary directory"""
+    monkeypatch.setattr(bar_store, "BAR_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+def make_bars(days=DAYS, seed=0):
+    """Return random-walk daily bars for SYMBOLS"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2024-12-31", periods=days)
+    bars = {}
+    for symbol in SYMBOLS:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+        bars[symbol] = pd.DataFrame(
+            {'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close},
+            index=index
+        )
+    return bars
+
+def assert_matches_rebuild(correlations):
+    """Check an incrementally updated cache against one rebuilt from the store"""
+    rebuilt = RollingCorrelation(SYMBOLS, WINDOW)
+    rebuilt.rebuild()
+    assert correlations.last_date == rebuilt.last_date
+    np.testing.assert_allclose(correlations.covariance, rebuilt.covariance, atol=1e-7)
+    np.testing.assert_allclose(correlations.correlation, rebuilt.correlation, atol=1e-5)
+
+def test_partly_filled_store(store):
+    bars = make_bars()
+    stored, missing = SYMBOLS[:2], SYMBOLS[2:]
+    for symbol in stored:
+        bar_store.merge_bars(symbol, bars[symbol].iloc[:-5])
+
+    correlations = RollingCorrelation(SYMBOLS, WINDOW)
+    assert correlations.update()
+    assert correlations.correlation.dtype == np.float32
+    assert np.isfinite(correlations.correlation).all()
+    assert all(correlations.has_data(symbol) for symbol in stored)
+    assert not any(correlations.has_data(symbol) for symbol in missing)
+    assert correlations.most_correlated(missing[0]) == []
+    assert_matches_rebuild(correlations)
+
+    # New days for the stored symbols are rank-1 updates
+    for k in range(4, -1, -1):
+        for symbol in stored:
+            bar_store.merge_bars(symbol, bars[symbol].iloc[:len(bars[symbol]) - k])
+        assert correlations.update()
+        assert_matches_rebuild(correlations)
+    assert not correlations.update()
+
+    # Symbols stored for the first time rebuild the window
+    for symbol in missing:
+        bar_store.merge_bars(symbol, bars[symbol])
+    assert correlations.update()
+    assert all(correlations.has_data(symbol) for symbol in SYMBOLS)
+    assert_matches_rebuild(correlations)
+
+def test_revised_last_bar(store):
+    bars = make_bars()
+    for symbol in SYMBOLS:
+        bar_store.merge_bars(symbol, bars[symbol])
+    correlations = RollingCorrelation(SYMBOLS, WINDOW)
+    correlations.update()
+
+    revised = bars[SYMBOLS[0]].iloc[-1:].copy()
+    revised['Close'] *= 1.02
+    bar_store.merge_bars(SYMBOLS[0], revised)
+    assert correlations.update()
+    assert_matches_rebuild(correlations)
+
+def test_empty_store(store):
+    correlations = RollingCorrelation(SYMBOLS, WINDOW)
+    correlations.update()
+    assert correlations.last_date is None
+    assert correlations.top_pairs() == []
+
+def test_lagging_symbols_catch_up(store):
+    bars = make_bars()
+    leading, lagging = SYMBOLS[:2], SYMBOLS[2:]
+    for symbol in SYMBOLS:
+        bar_store.merge_bars(symbol, bars[symbol].iloc[:-3])
+    correlations = RollingCorrelation(SYMBOLS, WINDOW)
+    correlations.update()
+
+    # One group moves ahead a day at a time while the other's bars lag
+    for k in (2, 1):
+        for symbol in leading:
+            bar_store.merge_bars(symbol, bars[symbol].iloc[:len(bars[symbol]) - k])
+        correlations.update()
+    for symbol in lagging:
+        bar_store.merge_bars(symbol, bars[symbol].iloc[:-1])
+    assert correlations.update()
+    assert_matches_rebuild(correlations)
+
+    for symbol in SYMBOLS:
+        bar_store.merge_bars(symbol, bars[symbol])
+    assert correlations.update()
+    assert_matches_rebuild(correlations)
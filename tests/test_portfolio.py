@@ -0,0 +1,98 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_store
+from correlation import RollingCorrelation
+from futures_data import CONTRACTS_BY_SYMBOL, MarketSnapshot
+from portfolio import Portfolio, INITIAL_CAPACITY
+
+SYMBOLS = list(CONTRACTS_BY_SYMBOL)[:INITIAL_CAPACITY + 8]
+DAYS = 120
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fill a temporary bar store with correlated random walks for SYMBOLS"""
+    monkeypatch.setattr(bar_store, "BAR_STORE_DIR", str(tmp_path))
+    rng = np.random.default_rng(1)
+    index = pd.bdate_range(end="2024-12-31", periods=DAYS)
+    market = rng.normal(0, 0.01, DAYS)
+    for symbol in SYMBOLS:
+        returns = rng.uniform(-1, 1) * market + rng.normal(0, 0.01, DAYS)
+        close = 100 * np.exp(np.cumsum(returns))
+        bar_store.merge_bars(symbol, pd.DataFrame(
+            {'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close}, index=index
+        ))
+    return tmp_path
+
+def make_snapshot(seed=2):
+    """Return a snapshot with a price and ATR for every symbol"""
+    rng = np.random.default_rng(seed)
+    return MarketSnapshot(
+        dict(zip(SYMBOLS, rng.uniform(10, 5000, len(SYMBOLS)))),
+        dict(zip(SYMBOLS, rng.uniform(0.1, 50, len(SYMBOLS))))
+    )
+
+def direct_risk(positions, snapshot, correlations):
+    """Return sqrt(w' C w) computed from scratch for a book of positions"""
+    symbols = list(positions)
+    if not symbols:
+        return 0.0
+    w = np.array([
+        positions[s] * CONTRACTS_BY_SYMBOL[s]['multiplier'] * snapshot.atr(s) for s in symbols
+    ])
+    rows = [correlations.index[s] for s in symbols]
+    c = correlations.correlation[np.ix_(rows, rows)].astype('f8')
+    return math.sqrt(max(w @ c @ w, 0.0))
+
+def test_incremental_risk_matches_direct(store):
+    correlations = RollingCorrelation(SYMBOLS)
+    correlations.update()
+    snapshot = make_snapshot()
+    portfolio = Portfolio(100000, snapshot, correlations)
+    rng = np.random.default_rng(3)
+    positions = {}
+
+    for _ in range(300):
+        symbol = SYMBOLS[rng.integers(len(SYMBOLS))]
+        if symbol in positions and rng.random() < 0.2:
+            portfolio.remove_position(symbol)
+            del positions[symbol]
+        else:
+            contracts = int(rng.integers(-10, 11))
+            portfolio.set_position(symbol, contracts)
+            if contracts:
+                positions[symbol] = contracts
+            else:
+                positions.pop(symbol, None)
+
+        summary = portfolio.summary()
+        assert portfolio.positions == positions
+        assert summary['correlated_risk'] == pytest.approx(direct_risk(positions, snapshot, correlations), rel=1e-9, abs=1e-6)
+
+    # Every symbol has been added, so the leg arrays grew past their initial capacity
+    assert len(portfolio._symbols) == len(SYMBOLS) > INITIAL_CAPACITY
+    gross = sum(abs(n) * snapshot.price(s) * CONTRACTS_BY_SYMBOL[s]['multiplier'] for s, n in positions.items())
+    assert summary['gross_notional'] == pytest.approx(gross)
+    assert summary['missing_data'] == []
+
+def test_new_correlations_are_picked_up(store):
+    correlations = RollingCorrelation(SYMBOLS)
+    correlations.update()
+    snapshot = make_snapshot()
+    portfolio = Portfolio(100000, snapshot, correlations)
+    positions = {symbol: i % 5 - 2 for i, symbol in enumerate(SYMBOLS[:10]) if i % 5 != 2}
+    for symbol, contracts in positions.items():
+        portfolio.set_position(symbol, contracts)
+
+    # A new daily bar moves the cache on; the next new leg refills C from it
+    for symbol in SYMBOLS:
+        last = bar_store.read_bars(symbol).iloc[-1:]
+        bar_store.merge_bars(symbol, last.set_axis(last.index + pd.offsets.BDay(1)) * 1.01)
+    assert correlations.update()
+    portfolio.set_position(SYMBOLS[-1], 3)
+    positions[SYMBOLS[-1]] = 3
+    assert portfolio.summary()['correlated_risk'] == pytest.approx(
+        direct_risk(positions, snapshot, correlations), rel=1e-9
+    )